@@ -0,0 +1,276 @@
+# 小红书风格图文合成的排版与绘制（纯Pillow，无网络、配置、日志等导入副作用）
+# 合成进程池的子进程只导入本模块，不会重复创建 main 中的API客户端、Redis连接和日志线程
+import functools
+import os
+import random
+import re
+import tempfile
+from typing import List
+
+from PIL import Image, ImageDraw, ImageFont
+
+@functools.lru_cache(maxsize=128)
+def _load_source_image(cached_path: str, min_width: int, min_height: int) -> Image.Image:
+    """
+    解码本地缓存的原图并常驻内存（返回对象为共享只读，调用方不得原地修改）
+    min_width/min_height: 合成所需的最小尺寸；JPEG按此以DCT缩放直接低分辨率解码，尺寸不会低于该值
+    """
+    with Image.open(cached_path) as source_image:
+        source_image.draft('RGB', (min_width, min_height))
+        source_image.load()
+        return source_image.copy()
+
+@functools.lru_cache(maxsize=8)
+def _rounded_corner_mask(width: int, height: int, radius: int) -> Image.Image:
+    """按尺寸和半径缓存圆角遮罩（合成尺寸固定，实际只会生成一次；共享只读）"""
+    mask = Image.new('L', (width, height), 0)
+    mask_draw = ImageDraw.Draw(mask)
+    mask_draw.rounded_rectangle((0, 0, width, height), radius=radius, fill=255)
+    return mask
+
+@functools.lru_cache(maxsize=8192)
+def _glyph_width(font, char: str) -> float:
+    """缓存单个字符在指定字体下的前进宽度"""
+    return font.getlength(char)
+
+# 断句：在句号、感叹号、问号之后或换行处切分，单次扫描
+_SENTENCE_SPLIT_PATTERN = re.compile(r'(?<=[。！？])|\n')
+
+# 小红书风格表情符号
+_XIAOHONGSHU_EMOJIS = ("💫", "✨", "🌟", "💖", "🎀", "🌸", "🦋", "🌈")
+
+class CompositionRenderer:
+    """图文合成渲染器 - 小红书风格（同步执行，每个进程只需一个实例）"""
+    
+    def __init__(self):
+        # 小红书风格的竖版尺寸比例 (3:4)
+        self.canvas_width = 600
+        self.canvas_height = 800
+        self.padding = 30
+        self.corner_radius = 20
+        # 原图区域：占75%高度，左右留出边距
+        self.image_height = int(self.canvas_height * 0.75)
+        self.image_width = self.canvas_width - 2 * self.padding
+        
+        # 字体只在初始化时加载一次
+        self.title_font, self.content_font, self.tag_font = self._load_fonts()
+    
+    @staticmethod
+    def _load_fonts():
+        """按 微软雅黑 -> Arial -> 默认字体 的顺序加载标题/内容/标签字体"""
+        try:
+            # Windows系统字体
+            return (
+                ImageFont.truetype("msyh.ttc", 20),  # 标题字体
+                ImageFont.truetype("msyh.ttc", 14),  # 内容字体
+                ImageFont.truetype("msyh.ttc", 12)   # 标签字体
+            )
+        except OSError:
+            try:
+                return (
+                    ImageFont.truetype("arial.ttf", 20),
+                    ImageFont.truetype("arial.ttf", 14),
+                    ImageFont.truetype("arial.ttf", 12)
+                )
+            except OSError:
+                return ImageFont.load_default(), ImageFont.load_default(), ImageFont.load_default()
+    
+    def render(self, original_image: Image.Image, text: str, summary: str, composed_path: str):
+        """在画布上排版原图与文字，并写入合成图片文件（同步执行）"""
+        # 创建画布 - 小红书风格的竖版比例
+        canvas = Image.new('RGB', (self.canvas_width, self.canvas_height), '#FAFAFA')
+        
+        # 调整原图片大小，保持比例并填充大部分画布
+        image_height = self.image_height  # 图片占75%高度
+        image_width = self.image_width
+        
+        # 保持原图比例的同时调整大小
+        original_ratio = original_image.width / original_image.height
+        target_ratio = image_width / image_height
+        
+        # 先确定居中裁剪区域，再只对该区域重采样（resize的box参数），避免缩放整张原图后再裁掉
+        if original_ratio > target_ratio:
+            # 原图更宽，以高度为准
+            new_height = image_height
+            new_width = int(new_height * original_ratio)
+            scale = new_width / original_image.width
+            crop_x = (new_width - image_width) // 2
+            source_box = (crop_x / scale, 0, (crop_x + image_width) / scale, original_image.height)
+        else:
+            # 原图更高，以宽度为准
+            new_width = image_width
+            new_height = int(new_width / original_ratio)
+            scale = new_height / original_image.height
+            crop_y = (new_height - image_height) // 2
+            source_box = (0, crop_y / scale, original_image.width, (crop_y + image_height) / scale)
+        
+        resized_image = original_image.resize(
+            (image_width, image_height), Image.Resampling.LANCZOS, box=source_box
+        )
+        
+        # 创建圆角图片
+        rounded_image = self._create_rounded_image(resized_image, self.corner_radius)
+        
+        # 将图片粘贴到画布上
+        image_y = self.padding
+        canvas.paste(rounded_image, (self.padding, image_y), rounded_image)
+        
+        # 在图片底部区域添加文字 - 小红书风格
+        draw = ImageDraw.Draw(canvas)
+        
+        # 使用初始化时加载好的字体
+        title_font = self.title_font
+        content_font = self.content_font
+        tag_font = self.tag_font
+        
+        # 文字区域起始位置
+        text_start_y = image_y + image_height + 20
+        text_area_height = self.canvas_height - text_start_y - self.padding
+        
+        # 绘制标题 - 小红书风格的标题
+        title_text = f"✨ {summary}"
+        title_y = text_start_y
+        draw.text((self.padding, title_y), title_text, fill='#2C2C2C', font=title_font)
+        
+        # 绘制内容预览 - 限制行数，添加省略号
+        content_y = title_y + 35
+        max_width = self.canvas_width - 2 * self.padding
+        
+        # 处理文本内容，添加小红书风格的表情符号
+        processed_text = self._process_text_for_xiaohongshu(text)
+        lines = self._wrap_text(processed_text, content_font, max_width, draw)
+        
+        # 最多显示3行内容
+        max_lines = 3
+        for i, line in enumerate(lines[:max_lines]):
+            line_y = content_y + i * 22
+            if line_y + 22 < self.canvas_height - self.padding - 30:
+                # 如果是最后一行且还有更多内容，添加省略号
+                if i == max_lines - 1 and len(lines) > max_lines:
+                    line = line[:30] + "..."
+                draw.text((self.padding, line_y), line, fill='#666666', font=content_font)
+        
+        # 添加小红书风格的标签
+        tag_y = self.canvas_height - self.padding - 25
+        tags = ["#AI生成", "#创意分享", "#长文本"]
+        tag_x = self.padding
+        
+        for tag in tags:
+            # 绘制标签背景
+            tag_bbox = draw.textbbox((0, 0), tag, font=tag_font)
+            tag_width = tag_bbox[2] - tag_bbox[0] + 16
+            tag_height = 20
+            
+            # 检查是否超出画布宽度
+            if tag_x + tag_width > self.canvas_width - self.padding:
+                break
+            
+            # 绘制圆角矩形背景
+            self._draw_rounded_rectangle(draw, (tag_x, tag_y, tag_x + tag_width, tag_y + tag_height), 
+                                       fill='#F0F0F0', radius=10)
+            
+            # 绘制标签文字
+            text_x = tag_x + 8
+            text_y = tag_y + 3
+            draw.text((text_x, text_y), tag, fill='#888888', font=tag_font)
+            
+            tag_x += tag_width + 8
+        
+        # 保存合成图片：先写临时文件再原子替换，避免并发请求读到半个文件
+        composed_dir = os.path.dirname(composed_path) or "."
+        os.makedirs(composed_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=composed_dir, delete=False) as temp_file:
+            canvas.save(temp_file, format='WEBP', quality=82, method=4)  # 同等观感下体积明显小于JPEG
+        os.replace(temp_file.name, composed_path)
+    
+    def _create_rounded_image(self, image: Image.Image, radius: int) -> Image.Image:
+        """创建圆角图片"""
+        # 获取圆角遮罩（按尺寸缓存）
+        mask = _rounded_corner_mask(image.size[0], image.size[1], radius)
+        
+        # 取原图RGB通道
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        
+        # 直接以遮罩作为alpha通道合并，省去透明画布与粘贴
+        return Image.merge('RGBA', (*image.split(), mask))
+    
+    def _draw_rounded_rectangle(self, draw, coords, fill, radius):
+        """绘制圆角矩形"""
+        x1, y1, x2, y2 = coords
+        draw.rounded_rectangle((x1, y1, x2, y2), radius=radius, fill=fill)
+    
+    def _process_text_for_xiaohongshu(self, text: str) -> str:
+        """为文本添加小红书风格的处理"""
+        # 限制文本长度
+        if len(text) > 150:
+            text = text[:150] + "..."
+        
+        # 添加一些小红书风格的表情符号（随机）
+        if random.random() < 0.3:  # 30%概率添加表情符号
+            text = f"{random.choice(_XIAOHONGSHU_EMOJIS)} {text}"
+        
+        return text
+    
+    def _wrap_text(self, text: str, font, max_width: int, draw) -> List[str]:
+        """文字自动换行 - 优化版（按字符前进宽度累加，不再逐次测量整行）"""
+        lines = []
+        
+        # 按句号、感叹号、问号等分割（标点保留在句尾，原有换行同样断开）
+        sentences = _SENTENCE_SPLIT_PATTERN.split(text)
+        
+        current_line = ""
+        current_width = 0.0
+        for sentence in sentences:
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+                
+            # 检查当前行加上新句子是否超宽
+            sentence_width = sum(_glyph_width(font, char) for char in sentence)
+            
+            if current_width + sentence_width <= max_width:
+                current_line += sentence
+                current_width += sentence_width
+            else:
+                # 如果当前行不为空，先保存当前行
+                if current_line.strip():
+                    lines.append(current_line.strip())
+                
+                # 检查单个句子是否需要进一步分割
+                if len(sentence) > 20:  # 如果句子太长，按字符分割
+                    current_line = ""
+                    current_width = 0.0
+                    for word in sentence:  # 中文按字符分割
+                        word_width = _glyph_width(font, word)
+                        
+                        if current_width + word_width <= max_width:
+                            current_line += word
+                            current_width += word_width
+                        else:
+                            if current_line:
+                                lines.append(current_line)
+                            current_line = word
+                            current_width = word_width
+                else:
+                    current_line = sentence
+                    current_width = sentence_width
+        
+        # 添加最后一行
+        if current_line.strip():
+            lines.append(current_line.strip())
+        
+        return lines
+
+@functools.lru_cache(maxsize=1)
+def get_renderer() -> CompositionRenderer:
+    """当前进程的渲染器，首次使用时创建（字体只加载一次）"""
+    return CompositionRenderer()
+
+def compose_to_file(source_path: str, text: str, summary: str, composed_path: str):
+    """
+    读取本地原图并合成写入composed_path：合成进程池的任务入口，未启用进程池时在线程中调用
+    """
+    renderer = get_renderer()
+    original_image = _load_source_image(source_path, renderer.image_width, renderer.image_height)
+    renderer.render(original_image, text, summary, composed_path)
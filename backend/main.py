@@ -1,34 +1,150 @@
-from fastapi import FastAPI, HTTPException
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import aclosing, asynccontextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict
+from typing import Dict, List, Optional
 import os
 from dotenv import load_dotenv
 import asyncio
-import json
-from volcenginesdkarkruntime import Ark
-# 图像处理和生成
-from PIL import Image, ImageDraw, ImageFont
-import requests
-import io
+import atexit
 import base64
+import functools
+import logging
+import logging.handlers
+import multiprocessing
+import queue
+import orjson
+# 图像处理和生成
+from PIL import Image
+from compose import compose_to_file
+import httpx
 import hashlib
+import json
+import re
+import tempfile
+import time
+import types
+import zlib
+from uuid import uuid4
+from xml.sax.saxutils import escape as _xml_escape
 from datetime import datetime
 import openai
 
+try:
+    # 可选依赖：Aho-Corasick多模式匹配（pyahocorasick）
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    # 可选依赖：Redis图片结果缓存
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
 # 加载环境变量
 load_dotenv()
 
+# 日志配置：请求路径只把日志记录放入队列，由后台线程（QueueListener）负责输出
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+logger = logging.getLogger("long_text_to_images")
+logger.setLevel(LOG_LEVEL)
+logger.propagate = False
+
+_log_queue = queue.SimpleQueue()
+_log_output_handler = logging.StreamHandler()
+_log_output_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_output_handler)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+# 共享的异步HTTP客户端（HTTP/2 + keep-alive连接复用）
+http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """获取共享的异步HTTP客户端，首次使用时创建"""
+    global http_client
+    if http_client is None:
+        http_client = httpx.AsyncClient(
+            http2=True,
+            timeout=30,
+            follow_redirects=True,
+            limits=httpx.Limits(max_keepalive_connections=100, max_connections=200)
+        )
+    return http_client
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时创建共享连接池，关闭时释放"""
+    global http_client
+    app.state.http = get_http_client()
+    # 服务实例为无请求状态的单例，启动时挂到app.state供依赖注入使用
+    app.state.image_service = image_generator
+    app.state.image_composer = image_composer
+    # 合成进程池使用spawn启动：此时已有事件循环和日志线程，fork出的子进程可能继承被占用的锁；子进程只导入无副作用的compose模块
+    if COMPOSE_PROCESSES > 0:
+        image_composer.process_pool = ProcessPoolExecutor(
+            max_workers=COMPOSE_PROCESSES, mp_context=multiprocessing.get_context("spawn")
+        )
+    # 路由在导入时已全部注册，OpenAPI文档启动时序列化一次，之后直接返回字节
+    app.state.openapi_bytes = orjson.dumps(app.openapi())
+    # 原图/合成图/代理图片缓存按TTL和容量上限定期清理，避免磁盘无限增长
+    sweep_task = asyncio.create_task(_sweep_disk_caches_periodically())
+    yield
+    sweep_task.cancel()
+    await http_client.aclose()
+    http_client = None
+    if image_composer.process_pool is not None:
+        image_composer.process_pool.shutdown(wait=False, cancel_futures=True)
+        image_composer.process_pool = None
+
+# 文本分析请求体上限：1万字按JSON最坏的\uXXXX转义计算（6字节/字），另留4KB给风格提示词等字段
+ANALYZE_MAX_BODY_BYTES = 10000 * 6 + 4096
+_ANALYZE_TOO_LARGE_BYTES = orjson.dumps({"detail": "请求体过大：文本长度不能超过10000字"})
+
+class BodySizeLimitMiddleware:
+    """按Content-Length提前拒绝超大的请求，不读取也不解析请求体（纯ASGI实现，不影响流式响应）"""
+    
+    def __init__(self, app, max_body_bytes: int, paths: tuple):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+        self.paths = paths
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.paths:
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    if value.isdigit() and int(value) > self.max_body_bytes:
+                        response = Response(content=_ANALYZE_TOO_LARGE_BYTES, status_code=413,
+                                            media_type="application/json")
+                        await response(scope, receive, send)
+                        return
+                    break
+        await self.app(scope, receive, send)
+
 # 创建FastAPI应用
 app = FastAPI(
     title="创意加速器 - 长文本转图片API",
     description="将长文本智能拆分并生成对应图片的AI应用",
     version="1.0.0",
-    docs_url="/docs",
-    redoc_url="/redoc",
-    openapi_url="/openapi.json"
+    # 文档路由在下方自行注册，以返回预先序列化的OpenAPI字节
+    docs_url=None,
+    redoc_url=None,
+    openapi_url=None,
+    lifespan=lifespan
 )
 
+# 超大请求在进入路由前拒绝（先注册，位于CORS内层，413响应同样带CORS头）
+app.add_middleware(BodySizeLimitMiddleware, max_body_bytes=ANALYZE_MAX_BODY_BYTES,
+                   paths=("/api/analyze-text", "/api/analyze-and-generate"))
+
 # 配置CORS
 app.add_middleware(
     CORSMiddleware,
@@ -36,37 +152,52 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Batch-Id"],  # 流式生成接口通过该响应头返回批次ID
 )
 
-# 数据模型定义
+# 数据模型定义（Pydantic v2：实例创建后只读，忽略多余字段）
+_MODEL_CONFIG = ConfigDict(extra='ignore', frozen=True)
+
 class TextAnalysisRequest(BaseModel):
+    model_config = _MODEL_CONFIG
+    
     text: str
     style_prompt: Optional[str] = "现代简约风格"
     max_segments: Optional[int] = 10
 
 class TextSegment(BaseModel):
+    model_config = _MODEL_CONFIG
+    
     id: int
     content: str
     summary: str
     image_prompt: str
 
 class TextAnalysisResponse(BaseModel):
+    model_config = _MODEL_CONFIG
+    
     segments: List[TextSegment]
     total_count: int
     estimated_time: int  # 预估生成时间（秒）
 
 class ImageGenerationRequest(BaseModel):
+    model_config = _MODEL_CONFIG
+    
     segments: List[TextSegment]
     style_prompt: str
     image_size: str = "3:4"
 
 class GeneratedImage(BaseModel):
+    model_config = _MODEL_CONFIG
+    
     segment_id: int
     image_url: str
     thumbnail_url: str
     status: str  # "generating", "completed", "failed"
 
 class ImageGenerationResponse(BaseModel):
+    model_config = _MODEL_CONFIG
+    
     images: List[GeneratedImage]
     batch_id: str
     total_count: int
@@ -83,9 +214,8 @@ if not VOLCANO_ARK_API_KEY:
 client = None
 if VOLCANO_ARK_API_KEY and VOLCANO_ARK_API_KEY not in ["YOUR_API_KEY_HERE", "YOUR_REAL_API_KEY_HERE"]:
     try:
-        # 使用OpenAI兼容的客户端初始化方式
-        import openai
-        client = openai.OpenAI(
+        # 使用OpenAI兼容的异步客户端，调用不阻塞事件循环
+        client = openai.AsyncOpenAI(
             api_key=VOLCANO_ARK_API_KEY,
             base_url="https://ark.cn-beijing.volces.com/api/v3"
         )
@@ -100,11 +230,750 @@ else:
 IMAGE_GENERATION_SERVICE = os.getenv("IMAGE_GENERATION_SERVICE", "demo")
 VOLCANO_IMAGE_MODEL = os.getenv("VOLCANO_IMAGE_MODEL", "doubao-seedream-4-0-250828")
 VOLCANO_IMAGE_SIZE = os.getenv("VOLCANO_IMAGE_SIZE", "768x1024")  # 小红书风格的3:4比例
+# 图片生成服务（ImageGenerationService）各服务商实际请求的(模型, 尺寸)，同时作为结果缓存键的一部分
+_VOLCANO_SERVICE_IMAGE = (VOLCANO_IMAGE_MODEL, "1024x1024")  # 使用标准尺寸格式
+_OPENAI_SERVICE_IMAGE = ("dall-e-3", "768x1024")  # 小红书风格的3:4比例
+VOLCANO_CONCURRENCY = int(os.getenv("VOLCANO_CONCURRENCY", "5"))  # 同时进行的SeeDream调用上限
+VOLCANO_RATE_LIMIT = float(os.getenv("VOLCANO_RATE_LIMIT", "5"))  # SeeDream每秒请求数上限
+VOLCANO_MAX_RETRIES = int(os.getenv("VOLCANO_MAX_RETRIES", "2"))  # SeeDream超时/限流/5xx时的重试次数
+OPENAI_CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", "3"))
+OPENAI_RATE_LIMIT = float(os.getenv("OPENAI_RATE_LIMIT", "1"))
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 BAIDU_API_KEY = os.getenv("BAIDU_API_KEY")
 BAIDU_SECRET_KEY = os.getenv("BAIDU_SECRET_KEY")
 ALI_API_KEY = os.getenv("ALI_API_KEY")
 
+# 图片结果缓存配置（Redis）
+REDIS_URL = os.getenv("REDIS_URL")
+IMAGE_CACHE_TTL = int(os.getenv("IMAGE_CACHE_TTL", "72000"))  # 服务商返回的图片URL约24小时过期，缓存需短于该时长
+# 磁盘图片缓存（原图/合成图/代理图片）的清理：修改时间超过TTL的文件删除，单个目录仍超过容量上限时从最旧的文件开始删除
+DISK_CACHE_TTL = int(os.getenv("DISK_CACHE_TTL", "604800"))  # 7天
+DISK_CACHE_MAX_BYTES = int(os.getenv("DISK_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))  # 每个目录2GB
+DISK_CACHE_SWEEP_INTERVAL = int(os.getenv("DISK_CACHE_SWEEP_INTERVAL", "600"))  # 每10分钟检查一次
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "604800"))  # 文本分析结果缓存7天
+BATCH_STATE_TTL = int(os.getenv("BATCH_STATE_TTL", "3600"))  # 批次生成状态保留1小时
+
+redis_client = None
+if REDIS_URL and aioredis:
+    try:
+        redis_client = aioredis.from_url(REDIS_URL)
+        print("Redis图片缓存已启用")
+    except Exception as e:
+        print(f"Redis客户端初始化失败: {e}")
+        redis_client = None
+if redis_client is None:
+    print("警告: 未启用Redis，批次进度仅在当前worker内可见；多worker部署（如Docker镜像默认的4个worker）请配置REDIS_URL")
+
+# 生成图片代理配置：服务商返回的签名URL有效期短，落盘后由 /api/img/{hash} 提供可长期缓存的地址
+IMAGE_PROXY_CACHE_DIR = os.getenv("IMAGE_PROXY_CACHE_DIR", "cache/images")
+# 进程内保留的代理映射/媒体类型条数上限（超出后淘汰最久未使用的条目）
+IMAGE_PROXY_MAP_SIZE = int(os.getenv("IMAGE_PROXY_MAP_SIZE", "4096"))
+# 图文合成所用原图的本地缓存目录（按URL哈希落盘，重复段落/用户不再走网络）
+IMAGE_SOURCE_CACHE_DIR = os.getenv("IMAGE_SOURCE_CACHE_DIR", "cache/sources")
+# 原图下载的最大并发数（各段落并发合成时避免触发图库限流）
+IMAGE_DOWNLOAD_CONCURRENCY = int(os.getenv("IMAGE_DOWNLOAD_CONCURRENCY", "8"))
+# 同时进行图片生成+图文合成的段落数上限（限制内存中同时解码的原图数量）
+SEEDREAM_CONCURRENCY = int(os.getenv("SEEDREAM_CONCURRENCY", "5"))
+# 每个uvicorn worker的图文合成进程数：排版和编码是CPU密集操作，放到进程池中并行（总进程数约为 worker数 x 该值，建议不超过CPU核数）；设为0则在线程中合成
+COMPOSE_PROCESSES = int(os.getenv("COMPOSE_PROCESSES", "2"))
+# 合成图片输出目录：按(原图, 文本, 摘要)哈希命名，由 /api/composed/{name} 提供可长期缓存的地址
+COMPOSED_IMAGE_DIR = os.getenv("COMPOSED_IMAGE_DIR", "cache/composed")
+
+# 增强版主题映射 - 基于AI描述的语义理解（模块加载时构建一次）
+_ENHANCED_THEME_MAPPING = {
+    # 自然风光类 - 扩展语义词汇
+    'nature_mountain': {
+        'keywords': ('山', '山峰', '山脉', '登山', '远足', '自然风光', '户外', '徒步', '山景', '高山', '雪山', '山顶', '峰峦', '巍峨', '壮丽'),
+        'semantic': ('雄伟', '壮观', '高耸', '险峻', '云雾缭绕', '山川', '峻岭', '巅峰', '登高', '俯瞰'),
+        'emotions': ('震撼', '敬畏', '征服', '挑战', '坚毅')
+    },
+    'nature_ocean': {
+        'keywords': ('海', '海洋', '海边', '海滩', '波浪', '海水', '沙滩', '海岸', '蓝色', '水面', '大海', '海浪', '潮汐', '海风'),
+        'semantic': ('辽阔', '深邃', '波涛', '浪花', '海天一色', '碧波', '汹涌', '宁静', '海鸥', '帆船'),
+        'emotions': ('自由', '宁静', '浪漫', '思考', '放松')
+    },
+    'nature_forest': {
+        'keywords': ('森林', '树林', '绿色', '植物', '叶子', '树木', '自然', '绿意', '清新', '大树', '古树', '林间', '丛林', '绿荫'),
+        'semantic': ('茂密', '幽静', '生机', '翠绿', '阳光透过', '鸟语花香', '小径', '清香', '氧气', '生态'),
+        'emotions': ('平静', '治愈', '清新', '生机', '和谐')
+    },
+    'nature_flower': {
+        'keywords': ('花', '花朵', '樱花', '梅花', '玫瑰', '花园', '花海', '盛开', '花瓣', '花蕊', '鲜花', '花束', '绽放', '芬芳'),
+        'semantic': ('娇艳', '芬芳', '绚烂', '花香', '蜜蜂', '蝴蝶', '花期', '花语', '美丽', '色彩'),
+        'emotions': ('美好', '浪漫', '温柔', '纯真', '爱情')
+    },
+    'nature_sky': {
+        'keywords': ('天空', '云', '蓝天', '白云', '晴天', '日出', '日落', '夕阳', '朝霞', '晚霞', '彩霞', '阳光', '云朵', '天际'),
+        'semantic': ('广阔', '无垠', '变幻', '光影', '色彩', '云卷云舒', '霞光', '金辉', '蔚蓝', '纯净'),
+        'emotions': ('希望', '自由', '梦想', '开阔', '向往')
+    },
+    
+    # 城市生活类
+    'city_modern': {
+        'keywords': ('城市', '都市', '现代', '高楼', '建筑', '街道', '都市风光', '摩天大楼', '现代建筑', '玻璃幕墙', '钢筋混凝土'),
+        'semantic': ('繁华', '现代化', '科技感', '都市节奏', '商业区', 'CBD', '天际线', '灯火辉煌', '车水马龙'),
+        'emotions': ('活力', '忙碌', '现代', '进步', '竞争')
+    },
+    'city_street': {
+        'keywords': ('街道', '马路', '路', '街景', '城市街道', '行人', '交通', '繁华', '十字路口', '车流', '人流', '商店'),
+        'semantic': ('熙熙攘攘', '川流不息', '红绿灯', '斑马线', '店铺', '招牌', '街头', '都市生活'),
+        'emotions': ('热闹', '生活', '忙碌', '多彩', '真实')
+    },
+    'city_cafe': {
+        'keywords': ('咖啡厅', '咖啡', '咖啡馆', '温暖', '惬意', '休闲', '下午茶', '咖啡店', '温馨', '拿铁', '卡布奇诺'),
+        'semantic': ('慢生活', '文艺', '小资', '聊天', '阅读', '音乐', '香气', '舒适', '放松'),
+        'emotions': ('惬意', '温馨', '放松', '享受', '文艺')
+    },
+    'city_night': {
+        'keywords': ('夜晚', '夜景', '灯光', '霓虹', '夜色', '城市夜景', '璀璨', '霓虹灯', '灯火通明', '夜生活'),
+        'semantic': ('绚烂', '迷人', '光影', '夜市', '酒吧', '夜店', '星光', '月光', '灯红酒绿'),
+        'emotions': ('浪漫', '神秘', '活力', '魅力', '梦幻')
+    },
+    
+    # 人物情感类
+    'people_portrait': {
+        'keywords': ('人物', '肖像', '面部', '表情', '眼神', '人像', '特写', '面容', '神情', '五官', '轮廓'),
+        'semantic': ('深邃', '专注', '凝视', '微表情', '个性', '气质', '魅力', '特征', '神韵'),
+        'emotions': ('专注', '深沉', '个性', '魅力', '真实')
+    },
+    'people_happy': {
+        'keywords': ('快乐', '开心', '笑容', '微笑', '欢乐', '愉快', '高兴', '兴奋', '喜悦', '幸福', '灿烂', '甜美'),
+        'semantic': ('阳光', '灿烂', '感染力', '正能量', '活力', '青春', '纯真', '美好'),
+        'emotions': ('快乐', '幸福', '满足', '阳光', '积极')
+    },
+    'people_sad': {
+        'keywords': ('伤心', '难过', '悲伤', '忧郁', '沮丧', '失落', '眼泪', '哭泣', '忧伤', '孤独', '思念'),
+        'semantic': ('忧郁', '深沉', '思考', '回忆', '怀念', '感伤', '眼泪', '孤单'),
+        'emotions': ('悲伤', '忧郁', '思念', '孤独', '感伤')
+    },
+    'people_love': {
+        'keywords': ('爱情', '浪漫', '情侣', '恋人', '拥抱', '亲吻', '甜蜜', '温馨', '爱', '浪漫', '约会', '牵手'),
+        'semantic': ('甜蜜', '温馨', '浪漫', '幸福', '相伴', '依偎', '深情', '眷恋'),
+        'emotions': ('爱情', '浪漫', '甜蜜', '幸福', '温暖')
+    },
+    'people_friendship': {
+        'keywords': ('友谊', '朋友', '友情', '陪伴', '一起', '合影', '友好', '聚会', '交谈', '分享', '支持'),
+        'semantic': ('真诚', '陪伴', '支持', '分享', '快乐', '信任', '理解', '珍贵'),
+        'emotions': ('友谊', '温暖', '支持', '快乐', '珍贵')
+    },
+    'people_family': {
+        'keywords': ('家庭', '亲情', '父母', '孩子', '家人', '温馨', '团聚', '家', '亲人', '关爱', '呵护'),
+        'semantic': ('温馨', '和睦', '关爱', '呵护', '传承', '责任', '依靠', '港湾'),
+        'emotions': ('温馨', '关爱', '安全', '归属', '责任')
+    },
+    
+    # 生活场景类
+    'life_home': {
+        'keywords': ('家', '家庭', '房间', '客厅', '卧室', '温馨', '居家', '生活', '家居', '装饰', '舒适'),
+        'semantic': ('温馨', '舒适', '私密', '放松', '归属', '安全', '个人空间', '生活气息'),
+        'emotions': ('温馨', '舒适', '安全', '放松', '归属')
+    },
+    'life_work': {
+        'keywords': ('工作', '办公', '电脑', '会议', '商务', '职场', '学习', '专注', '办公室', '效率', '专业'),
+        'semantic': ('专业', '效率', '专注', '认真', '责任', '成就', '挑战', '团队'),
+        'emotions': ('专注', '认真', '责任', '成就', '挑战')
+    },
+    'life_travel': {
+        'keywords': ('旅行', '旅游', '度假', '行李', '机场', '酒店', '风景', '探索', '旅途', '冒险', '发现'),
+        'semantic': ('自由', '探索', '发现', '体验', '冒险', '放松', '开阔', '记忆'),
+        'emotions': ('自由', '兴奋', '探索', '放松', '开阔')
+    },
+    'life_food': {
+        'keywords': ('美食', '食物', '餐厅', '烹饪', '料理', '美味', '餐桌', '品尝', '菜肴', '香味', '色香味'),
+        'semantic': ('美味', '香气', '色彩', '精致', '享受', '满足', '文化', '分享'),
+        'emotions': ('享受', '满足', '幸福', '分享', '文化')
+    },
+    'life_reading': {
+        'keywords': ('读书', '阅读', '书本', '学习', '知识', '图书', '文字', '思考', '书籍', '智慧', '文学'),
+        'semantic': ('安静', '专注', '思考', '智慧', '知识', '成长', '内涵', '修养'),
+        'emotions': ('宁静', '专注', '智慧', '成长', '充实')
+    },
+    
+    # 抽象概念类
+    'abstract_dream': {
+        'keywords': ('梦想', '希望', '未来', '理想', '憧憬', '目标', '追求', '愿望', '梦', '志向', '抱负'),
+        'semantic': ('远大', '美好', '追求', '奋斗', '坚持', '信念', '光明', '可能'),
+        'emotions': ('希望', '憧憬', '激励', '坚定', '美好')
+    },
+    'abstract_memory': {
+        'keywords': ('回忆', '记忆', '过去', '怀念', '思念', '往事', '童年', '青春', '时光', '岁月', '怀旧'),
+        'semantic': ('珍贵', '美好', '怀念', '感慨', '时光', '青春', '纯真', '难忘'),
+        'emotions': ('怀念', '感慨', '珍贵', '温暖', '感伤')
+    },
+    'abstract_growth': {
+        'keywords': ('成长', '进步', '发展', '提升', '改变', '蜕变', '突破', '进化', '成熟', '学习', '进取'),
+        'semantic': ('进步', '提升', '突破', '坚持', '努力', '收获', '成就', '蜕变'),
+        'emotions': ('成就', '满足', '自豪', '坚定', '积极')
+    },
+    'abstract_peace': {
+        'keywords': ('平静', '安静', '宁静', '祥和', '放松', '冥想', '内心', '禅意', '宁静', '静谧', '安详'),
+        'semantic': ('宁静', '平和', '安详', '内心', '冥想', '禅意', '超脱', '纯净'),
+        'emotions': ('平静', '安详', '放松', '纯净', '超脱')
+    },
+    'abstract_emotion': {
+        'keywords': ('情感', '温暖', '感动', '关爱', '温情', '心情', '感受', '情绪', '内心', '心灵', '感触'),
+        'semantic': ('深刻', '真挚', '温暖', '感人', '触动', '共鸣', '理解', '包容'),
+        'emotions': ('感动', '温暖', '真挚', '深刻', '共鸣')
+    },
+    
+    # 季节时间类
+    'season_spring': {
+        'keywords': ('春天', '春季', '新绿', '生机', '复苏', '嫩芽', '春意', '温暖', '春日', '花开', '万物复苏'),
+        'semantic': ('生机', '希望', '新生', '活力', '温暖', '绿意', '花开', '复苏'),
+        'emotions': ('希望', '活力', '新生', '温暖', '美好')
+    },
+    'season_summer': {
+        'keywords': ('夏天', '夏季', '炎热', '阳光', '海滩', '游泳', '清凉', '活力', '夏日', '热情', '火热'),
+        'semantic': ('热情', '活力', '阳光', '热烈', '充满活力', '青春', '激情', '奔放'),
+        'emotions': ('热情', '活力', '激情', '自由', '青春')
+    },
+    'season_autumn': {
+        'keywords': ('秋天', '秋季', '落叶', '金黄', '收获', '枫叶', '萧瑟', '成熟', '金秋', '丰收', '凉爽'),
+        'semantic': ('成熟', '收获', '丰富', '沉淀', '金黄', '美丽', '诗意', '感怀'),
+        'emotions': ('成熟', '收获', '感怀', '诗意', '沉静')
+    },
+    'season_winter': {
+        'keywords': ('冬天', '冬季', '雪', '寒冷', '雪花', '冰', '纯洁', '静谧', '雪景', '银装素裹', '洁白'),
+        'semantic': ('纯洁', '静谧', '洁白', '宁静', '素雅', '清冷', '美丽', '神圣'),
+        'emotions': ('纯洁', '宁静', '清冷', '神圣', '美丽')
+    },
+    
+    # 活动行为类
+    'activity_sport': {
+        'keywords': ('运动', '健身', '跑步', '瑜伽', '游泳', '锻炼', '活力', '健康', '体育', '汗水', '坚持'),
+        'semantic': ('活力', '健康', '坚持', '挑战', '突破', '汗水', '努力', '强健'),
+        'emotions': ('活力', '健康', '坚持', '挑战', '成就')
+    },
+    'activity_art': {
+        'keywords': ('艺术', '绘画', '音乐', '创作', '设计', '美术', '文艺', '创意', '艺术', '灵感', '美感'),
+        'semantic': ('创意', '美感', '灵感', '表达', '创造', '艺术', '文化', '审美'),
+        'emotions': ('创意', '美感', '表达', '文艺', '灵感')
+    },
+    'activity_relax': {
+        'keywords': ('休息', '放松', '躺着', '睡觉', '安静', '舒适', '惬意', '慵懒', '休闲', '悠闲', '享受'),
+        'semantic': ('舒适', '惬意', '悠闲', '放松', '享受', '慵懒', '安逸', '自在'),
+        'emotions': ('放松', '舒适', '惬意', '悠闲', '享受')
+    },
+    
+    # 动物宠物类
+    'animal_cat': {
+        'keywords': ('猫', '小猫', '猫咪', '喵星人', '可爱猫', '宠物猫', '猫咪', '喵喵'),
+        'semantic': ('可爱', '温顺', '优雅', '独立', '神秘', '灵动', '治愈', '陪伴'),
+        'emotions': ('可爱', '治愈', '温顺', '陪伴', '温暖')
+    },
+    'animal_dog': {
+        'keywords': ('狗', '小狗', '狗狗', '宠物狗', '忠诚', '汪星人', '犬', '小犬'),
+        'semantic': ('忠诚', '友好', '活泼', '陪伴', '守护', '可爱', '温暖', '信任'),
+        'emotions': ('忠诚', '友好', '陪伴', '温暖', '信任')
+    },
+    'animal_bird': {
+        'keywords': ('鸟', '小鸟', '飞鸟', '鸟儿', '翅膀', '飞翔', '鸟类', '羽毛'),
+        'semantic': ('自由', '轻盈', '优雅', '飞翔', '歌声', '美丽', '灵动', '天空'),
+        'emotions': ('自由', '轻盈', '优雅', '美丽', '灵动')
+    },
+    'animal_wild': {
+        'keywords': ('野生动物', '兔子', '松鼠', '蝴蝶', '昆虫', '动物', '野生', '自然'),
+        'semantic': ('自然', '野性', '生态', '和谐', '美丽', '神奇', '多样', '生命'),
+        'emotions': ('自然', '和谐', '美丽', '神奇', '生命')
+    }
+}
+
+# 小红书风格竖版图片库 - 扩展版（模块加载时构建一次，只读）
+_XIAOHONGSHU_IMAGES = {
+    # 自然风光类
+    'nature_mountain': (
+        'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1464822759844-d150baec0494?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1519904981063-b0cf448d479e?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1551632811-561732d1e306?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1506197603052-3cc9c3a201bd?w=400&h=600&fit=crop'
+    ),
+    'nature_ocean': (
+        'https://images.unsplash.com/photo-1505142468610-359e7d316be0?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1544551763-46a013bb70d5?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1507525428034-b723cf961d3e?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1518837695005-2083093ee35b?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1439066615861-d1af74d74000?w=400&h=600&fit=crop'
+    ),
+    'nature_forest': (
+        'https://images.unsplash.com/photo-1441974231531-c6227db76b6e?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1448375240586-882707db888b?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1518837695005-2083093ee35b?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1511593358241-7eea1f3c84e5?w=400&h=600&fit=crop'
+    ),
+    'nature_flower': (
+        'https://images.unsplash.com/photo-1490750967868-88aa4486c946?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1518895949257-7621c3c786d7?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1463320726281-696a485928c7?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1502082553048-f009c37129b9?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop'
+    ),
+    'nature_sky': (
+        'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1500382017468-9049fed747ef?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1519904981063-b0cf448d479e?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1506197603052-3cc9c3a201bd?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1464822759844-d150baec0494?w=400&h=600&fit=crop'
+    ),
+
+    # 城市生活类
+    'city_modern': (
+        'https://images.unsplash.com/photo-1449824913935-59a10b8d2000?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1486406146926-c627a92ad1ab?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1477959858617-67f85cf4f1df?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1514565131-fce0801e5785?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1480714378408-67cf0d13bc1f?w=400&h=600&fit=crop'
+    ),
+    'city_street': (
+        'https://images.unsplash.com/photo-1477959858617-67f85cf4f1df?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1514565131-fce0801e5785?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1449824913935-59a10b8d2000?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1486406146926-c627a92ad1ab?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1480714378408-67cf0d13bc1f?w=400&h=600&fit=crop'
+    ),
+    'city_cafe': (
+        'https://images.unsplash.com/photo-1501339847302-ac426a4a7cbb?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1554118811-1e0d58224f24?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1495474472287-4d71bcdd2085?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1559056199-641a0ac8b55e?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1521017432531-fbd92d768814?w=400&h=600&fit=crop'
+    ),
+    'city_night': (
+        'https://images.unsplash.com/photo-1514565131-fce0801e5785?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1477959858617-67f85cf4f1df?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1449824913935-59a10b8d2000?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1486406146926-c627a92ad1ab?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1480714378408-67cf0d13bc1f?w=400&h=600&fit=crop'
+    ),
+
+    # 人物情感类
+    'people_portrait': (
+        'https://images.unsplash.com/photo-1494790108755-2616c6106db4?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1517841905240-472988babdf9?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1500648767791-00dcc994a43e?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1438761681033-6461ffad8d80?w=400&h=600&fit=crop'
+    ),
+    'people_happy': (
+        'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1517841905240-472988babdf9?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1500648767791-00dcc994a43e?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1494790108755-2616c6106db4?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1438761681033-6461ffad8d80?w=400&h=600&fit=crop'
+    ),
+    'people_sad': (
+        'https://images.unsplash.com/photo-1494790108755-2616c6106db4?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1517841905240-472988babdf9?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1500648767791-00dcc994a43e?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1438761681033-6461ffad8d80?w=400&h=600&fit=crop'
+    ),
+    'people_love': (
+        'https://images.unsplash.com/photo-1516589178581-6cd7833ae3b2?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1518568814500-bf0f8d125f46?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1517841905240-472988babdf9?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1500648767791-00dcc994a43e?w=400&h=600&fit=crop'
+    ),
+    'people_friendship': (
+        'https://images.unsplash.com/photo-1529156069898-49953e39b3ac?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1517841905240-472988babdf9?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1500648767791-00dcc994a43e?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1494790108755-2616c6106db4?w=400&h=600&fit=crop'
+    ),
+    'people_family': (
+        'https://images.unsplash.com/photo-1511895426328-dc8714191300?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1517841905240-472988babdf9?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1500648767791-00dcc994a43e?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1494790108755-2616c6106db4?w=400&h=600&fit=crop'
+    ),
+
+    # 生活场景类
+    'life_home': (
+        'https://images.unsplash.com/photo-1586023492125-27b2c045efd7?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1560448204-e02f11c3d0e2?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1556909114-f6e7ad7d3136?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1484154218962-a197022b5858?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1493809842364-78817add7ffb?w=400&h=600&fit=crop'
+    ),
+    'life_work': (
+        'https://images.unsplash.com/photo-1497032628192-86f99bcd76bc?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1486312338219-ce68d2c6f44d?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1517841905240-472988babdf9?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1500648767791-00dcc994a43e?w=400&h=600&fit=crop'
+    ),
+    'life_travel': (
+        'https://images.unsplash.com/photo-1488646953014-85cb44e25828?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1464822759844-d150baec0494?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1519904981063-b0cf448d479e?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1551632811-561732d1e306?w=400&h=600&fit=crop'
+    ),
+    'life_food': (
+        'https://images.unsplash.com/photo-1504674900247-0877df9cc836?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1565299624946-b28f40a0ca4b?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1567620905732-2d1ec7ab7445?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1540189549336-e6e99c3679fe?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1551782450-a2132b4ba21d?w=400&h=600&fit=crop'
+    ),
+    'life_reading': (
+        'https://images.unsplash.com/photo-1481627834876-b7833e8f5570?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1517841905240-472988babdf9?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1500648767791-00dcc994a43e?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1494790108755-2616c6106db4?w=400&h=600&fit=crop'
+    ),
+
+    # 抽象概念类
+    'abstract_dream': (
+        'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1500382017468-9049fed747ef?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1519904981063-b0cf448d479e?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1506197603052-3cc9c3a201bd?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1464822759844-d150baec0494?w=400&h=600&fit=crop'
+    ),
+    'abstract_memory': (
+        'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1517841905240-472988babdf9?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1500648767791-00dcc994a43e?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1494790108755-2616c6106db4?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1438761681033-6461ffad8d80?w=400&h=600&fit=crop'
+    ),
+    'abstract_growth': (
+        'https://images.unsplash.com/photo-1490750967868-88aa4486c946?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1518895949257-7621c3c786d7?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1463320726281-696a485928c7?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1502082553048-f009c37129b9?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop'
+    ),
+    'abstract_peace': (
+        'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1500382017468-9049fed747ef?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1519904981063-b0cf448d479e?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1506197603052-3cc9c3a201bd?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1464822759844-d150baec0494?w=400&h=600&fit=crop'
+    ),
+    'abstract_emotion': (
+        'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1517841905240-472988babdf9?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1500648767791-00dcc994a43e?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1494790108755-2616c6106db4?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1438761681033-6461ffad8d80?w=400&h=600&fit=crop'
+    ),
+
+    # 季节时间类
+    'season_spring': (
+        'https://images.unsplash.com/photo-1490750967868-88aa4486c946?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1518895949257-7621c3c786d7?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1463320726281-696a485928c7?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1502082553048-f009c37129b9?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop'
+    ),
+    'season_summer': (
+        'https://images.unsplash.com/photo-1505142468610-359e7d316be0?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1544551763-46a013bb70d5?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1507525428034-b723cf961d3e?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1518837695005-2083093ee35b?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1439066615861-d1af74d74000?w=400&h=600&fit=crop'
+    ),
+    'season_autumn': (
+        'https://images.unsplash.com/photo-1441974231531-c6227db76b6e?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1448375240586-882707db888b?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1518837695005-2083093ee35b?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1511593358241-7eea1f3c84e5?w=400&h=600&fit=crop'
+    ),
+    'season_winter': (
+        'https://images.unsplash.com/photo-1578662996442-48f60103fc96?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1547036967-23d11aacaee0?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1483664852095-d6cc6870702d?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1464822759844-d150baec0494?w=400&h=600&fit=crop'
+    ),
+
+    # 活动行为类
+    'activity_sport': (
+        'https://images.unsplash.com/photo-1571019613454-1cb2f99b2d8b?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1544367567-0f2fcb009e0b?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1517841905240-472988babdf9?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1500648767791-00dcc994a43e?w=400&h=600&fit=crop'
+    ),
+    'activity_art': (
+        'https://images.unsplash.com/photo-1513475382585-d06e58bcb0e0?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1517841905240-472988babdf9?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1500648767791-00dcc994a43e?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1494790108755-2616c6106db4?w=400&h=600&fit=crop'
+    ),
+    'activity_relax': (
+        'https://images.unsplash.com/photo-1586023492125-27b2c045efd7?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1560448204-e02f11c3d0e2?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1556909114-f6e7ad7d3136?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1484154218962-a197022b5858?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1493809842364-78817add7ffb?w=400&h=600&fit=crop'
+    ),
+
+    # 动物宠物类
+    'animal_cat': (
+        'https://images.unsplash.com/photo-1514888286974-6c03e2ca1dba?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1533738363-b7f9aef128ce?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1574158622682-e40e69881006?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1592194996308-7b43878e84a6?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1518791841217-8f162f1e1131?w=400&h=600&fit=crop'
+    ),
+    'animal_dog': (
+        'https://images.unsplash.com/photo-1552053831-71594a27632d?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1587300003388-59208cc962cb?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1518717758536-85ae29035b6d?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1583337130417-3346a1be7dee?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1561037404-61cd46aa615b?w=400&h=600&fit=crop'
+    ),
+    'animal_bird': (
+        'https://images.unsplash.com/photo-1444464666168-49d633b86797?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1520637836862-4d197d17c55a?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1464822759844-d150baec0494?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1519904981063-b0cf448d479e?w=400&h=600&fit=crop'
+    ),
+    'animal_wild': (
+        'https://images.unsplash.com/photo-1474511320723-9a56873867b5?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1558618666-fcd25c85cd64?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1464822759844-d150baec0494?w=400&h=600&fit=crop',
+        'https://images.unsplash.com/photo-1519904981063-b0cf448d479e?w=400&h=600&fit=crop'
+    )
+}
+
+_THEME_BUCKETS = ('keywords', 'semantic', 'emotions')
+
+# 倒排索引：词汇 -> [(主题, 词库类别)]，保留重复词条以维持原有计分
+_THEME_KEYWORD_INDEX = {}
+for _theme, _theme_data in _ENHANCED_THEME_MAPPING.items():
+    for _bucket in _THEME_BUCKETS:
+        for _word in _theme_data[_bucket]:
+            _THEME_KEYWORD_INDEX.setdefault(_word, []).append((_theme, _bucket))
+
+# 视觉元素匹配使用的集合（关键词 + 语义词）
+_THEME_VISUAL_WORDS = {
+    theme: frozenset(theme_data['keywords'] + theme_data['semantic'])
+    for theme, theme_data in _ENHANCED_THEME_MAPPING.items()
+}
+
+class _KeywordScanner:
+    """
+    多关键词单次扫描器：优先使用Aho-Corasick自动机，未安装pyahocorasick时退回预编译的交替正则
+    """
+    
+    def __init__(self, keywords):
+        self.keywords = tuple(dict.fromkeys(keywords))
+        self.automaton = None
+        # 仅在pyahocorasick以Unicode模式编译时使用（C实现直接遍历str，无需编码为字节）
+        if ahocorasick is not None and getattr(ahocorasick, 'unicode', False) and self.keywords:
+            self.automaton = ahocorasick.Automaton(ahocorasick.STORE_ANY, ahocorasick.KEY_STRING)
+            for keyword in self.keywords:
+                self.automaton.add_word(keyword, (keyword, len(keyword) - 1))
+            self.automaton.make_automaton()
+        
+        # 备选方案：零宽前瞻交替正则一次定位所有候选起点，再按首字核对重叠的短词
+        longest_first = sorted(self.keywords, key=len, reverse=True)
+        self.by_first_char = {}
+        for keyword in longest_first:
+            self.by_first_char.setdefault(keyword[0], []).append(keyword)
+        self.pattern = re.compile('(?=(?:' + '|'.join(map(re.escape, longest_first)) + '))')
+    
+    def find_positions(self, text: str) -> Dict[str, List[int]]:
+        """单次扫描文本，返回每个命中词汇的全部起始位置（按出现顺序）"""
+        positions = {}
+        if not self.keywords:
+            return positions
+        
+        if self.automaton is not None:
+            for end_index, (keyword, offset) in self.automaton.iter(text):
+                positions.setdefault(keyword, []).append(end_index - offset)
+            return positions
+        
+        for match in self.pattern.finditer(text):
+            start = match.start()
+            for keyword in self.by_first_char[text[start]]:
+                if text.startswith(keyword, start):
+                    positions.setdefault(keyword, []).append(start)
+        return positions
+
+def _keyword_pattern(keywords) -> re.Pattern:
+    """把关键词列表预编译为交替正则，search() 命中第一个即返回"""
+    return re.compile('|'.join(map(re.escape, keywords)))
+
+def _count_non_overlapping(positions: List[int], length: int) -> int:
+    """按str.count的语义统计不重叠的出现次数"""
+    count = 0
+    next_start = 0
+    for position in positions:
+        if position >= next_start:
+            count += 1
+            next_start = position + length
+    return count
+
+def _stable_bucket(value: str, buckets: int) -> int:
+    """稳定哈希分桶：不受PYTHONHASHSEED影响，重启后同一输入仍落在同一个桶"""
+    digest = hashlib.blake2b(value.encode('utf-8'), digest_size=4).digest()
+    return int.from_bytes(digest, "big") % buckets
+
+# AI描述分析词库：场景类型、情感、视觉元素
+_AI_SCENE_KEYWORDS = {
+    'nature_mountain': ('山', '山峰', '山脉', '高山', '雪山', '峰峦', '登山', '徒步'),
+    'nature_ocean': ('海', '海洋', '海滩', '海岸', '波浪', '海水', '沙滩', '海边'),
+    'nature_forest': ('森林', '树林', '树木', '绿色', '叶子', '植物', '自然'),
+    'nature_flower': ('花', '花朵', '花园', '鲜花', '花瓣', '盛开', '绽放'),
+    'nature_sky': ('天空', '云', '云朵', '蓝天', '白云', '晴空', '天际'),
+    'city_modern': ('城市', '建筑', '高楼', '现代', '都市', '摩天大楼'),
+    'city_street': ('街道', '马路', '街景', '商店', '行人', '车辆'),
+    'lifestyle_food': ('食物', '美食', '餐厅', '菜品', '料理', '烹饪'),
+    'lifestyle_travel': ('旅行', '旅游', '景点', '度假', '探索', '冒险'),
+    'lifestyle_fashion': ('时尚', '服装', '穿搭', '风格', '潮流', '搭配'),
+    'animal_pet': ('宠物', '猫', '狗', '动物', '可爱', '毛茸茸'),
+    'animal_bird': ('鸟', '小鸟', '飞鸟', '翅膀', '飞翔', '羽毛'),
+    'animal_wild': ('野生动物', '兔子', '松鼠', '蝴蝶', '昆虫', '野生')
+}
+
+_AI_EMOTION_KEYWORDS = {
+    '温暖': ('温暖', '温馨', '舒适', '柔和', '亲切'),
+    '宁静': ('宁静', '安静', '平静', '祥和', '静谧'),
+    '活力': ('活力', '生机', '充满', '活跃', '动感'),
+    '浪漫': ('浪漫', '唯美', '梦幻', '美丽', '优雅'),
+    '神秘': ('神秘', '深邃', '朦胧', '幽深', '隐秘'),
+    '壮观': ('壮观', '雄伟', '壮丽', '震撼', '宏伟')
+}
+
+_AI_ELEMENT_KEYWORDS = ('颜色', '光线', '阴影', '纹理', '形状', '线条', '构图', '透视', '对比', '明暗')
+
+# 无主题得分时的默认主题判定词（按优先级排列）
+_DEFAULT_THEME_KEYWORDS = (
+    ('nature_sky', ('自然', '风景', '户外', '天空', '云')),
+    ('city_modern', ('城市', '建筑', '现代', '都市')),
+    ('animal_pet', ('动物', '宠物', '可爱')),
+    ('lifestyle_food', ('食物', '美食', '料理'))
+)
+
+# 主题词库与AI描述词库合并为一个扫描器，一次遍历提示词得到全部命中
+_PROMPT_SCANNER = _KeywordScanner(
+    list(_THEME_KEYWORD_INDEX)
+    + [keyword for keywords in _AI_SCENE_KEYWORDS.values() for keyword in keywords]
+    + [keyword for keywords in _AI_EMOTION_KEYWORDS.values() for keyword in keywords]
+    + list(_AI_ELEMENT_KEYWORDS)
+    + [keyword for _, keywords in _DEFAULT_THEME_KEYWORDS for keyword in keywords]
+)
+
+class TokenBucket:
+    """异步令牌桶：按固定速率补充令牌，令牌不足时等待"""
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self):
+        """取得一个令牌"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class ProviderLimiter:
+    """单个图片服务商的限流：并发上限（信号量）+ 请求速率（令牌桶）"""
+    
+    def __init__(self, max_concurrency: int, rate: float):
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._bucket = TokenBucket(rate)
+    
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        try:
+            await self._bucket.acquire()
+        except BaseException:
+            self._semaphore.release()
+            raise
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        self._semaphore.release()
+
+# 同步SDK调用放到线程中执行，按服务商限制并发数和请求速率，避免触发429
+_PROVIDER_LIMITERS = {
+    "volcano": ProviderLimiter(VOLCANO_CONCURRENCY, VOLCANO_RATE_LIMIT),
+    "openai": ProviderLimiter(OPENAI_CONCURRENCY, OPENAI_RATE_LIMIT),
+}
+
+# 可重试的瞬时错误：超时、连接失败、429限流、5xx
+_RETRYABLE_IMAGE_ERRORS = (openai.APITimeoutError, openai.APIConnectionError,
+                           openai.RateLimitError, openai.InternalServerError)
+# 图片接口由下方自行重试（退避期间不占用并发名额），关闭SDK内置重试避免叠加
+_image_client = client.with_options(max_retries=0) if client else None
+
+async def _generate_volcano_images(**kwargs):
+    """
+    调用SeeDream生成图片：每次尝试都经过限流器，瞬时错误按指数退避重试，重试耗尽后抛出
+    """
+    for attempt in range(VOLCANO_MAX_RETRIES + 1):
+        try:
+            async with _PROVIDER_LIMITERS["volcano"]:
+                return await _image_client.images.generate(**kwargs)
+        except _RETRYABLE_IMAGE_ERRORS as e:
+            if attempt >= VOLCANO_MAX_RETRIES:
+                raise
+            delay = min(4.0, 0.5 * 2 ** attempt)
+            logger.warning("SeeDream调用失败 (%s)，%.1f秒后第%d次重试", type(e).__name__, delay, attempt + 1)
+            await asyncio.sleep(delay)
+
+# 正在生成中的图片（按缓存键），相同提示词的并发请求共享同一次生成
+_pending_image_generations: Dict[str, asyncio.Task] = {}
+
+def _image_cache_key(*parts: str) -> str:
+    """按(服务, 模型, 尺寸, 提示词)等组成部分计算图片结果的缓存键"""
+    return "img:" + hashlib.blake2b("|".join(parts).encode('utf-8'), digest_size=16).hexdigest()
+
+async def _get_or_generate_image(cache_key: str, generate) -> Optional[str]:
+    """
+    带缓存的图片生成：先查Redis，未命中时调用generate()；相同缓存键的并发请求合并为一次调用
+    generate返回空值时表示生成失败，不写入缓存
+    """
+    if redis_client:
+        try:
+            cached_url = await redis_client.get(cache_key)
+            if cached_url:
+                return cached_url.decode('utf-8')
+        except Exception as e:
+            logger.warning("读取图片缓存失败: %s", e)
+    
+    generation_task = _pending_image_generations.get(cache_key)
+    if generation_task is None:
+        generation_task = asyncio.ensure_future(_generate_and_cache_image(cache_key, generate))
+        _pending_image_generations[cache_key] = generation_task
+        generation_task.add_done_callback(lambda _: _pending_image_generations.pop(cache_key, None))
+    # shield：某个等待方被取消时不影响其他请求共享的生成
+    return await asyncio.shield(generation_task)
+
+async def _generate_and_cache_image(cache_key: str, generate) -> Optional[str]:
+    """调用生成函数并把成功结果写入Redis"""
+    image_url = await generate()
+    if image_url and redis_client:
+        try:
+            await redis_client.setex(cache_key, IMAGE_CACHE_TTL, image_url)
+        except Exception as e:
+            logger.warning("写入图片缓存失败: %s", e)
+    return image_url
+
 class ImageGenerationService:
     """图片生成服务类"""
     
@@ -118,9 +987,9 @@ class ImageGenerationService:
         try:
             if self.service_type == "volcano" and client:
                 # 使用火山方舟SeeDream生成图片
-                return await self._generate_with_volcano(prompt)
+                return await self._generate_cached(self._generate_with_volcano, prompt, *_VOLCANO_SERVICE_IMAGE)
             elif self.service_type == "openai" and OPENAI_API_KEY and OPENAI_API_KEY != "YOUR_OPENAI_API_KEY_HERE":
-                return await self._generate_with_openai(prompt)
+                return await self._generate_cached(self._generate_with_openai, prompt, *_OPENAI_SERVICE_IMAGE)
             elif self.service_type == "baidu" and BAIDU_API_KEY and BAIDU_API_KEY != "YOUR_BAIDU_API_KEY_HERE":
                 return await self._generate_with_baidu(prompt)
             elif self.service_type == "ali" and ALI_API_KEY and ALI_API_KEY != "YOUR_ALI_API_KEY_HERE":
@@ -129,1014 +998,440 @@ class ImageGenerationService:
                 # 演示模式：生成基于内容的占位图片
                 return await self._generate_demo_image(prompt, segment_id)
         except Exception as e:
-            print(f"图片生成失败: {e}")
+            logger.warning("图片生成失败: %s", e)
             return await self._generate_demo_image(prompt, segment_id)
     
+    async def _generate_cached(self, generator, prompt: str, model: str, size: str) -> str:
+        """带缓存的图片生成：相同(服务, 模型, 尺寸, 提示词)直接复用已生成的图片URL；model/size须与实际请求一致"""
+        cache_key = _image_cache_key(self.service_type, model, size, prompt)
+        return await _get_or_generate_image(cache_key, lambda: generator(prompt))
+    
     async def _generate_with_volcano(self, prompt: str) -> str:
         """使用火山方舟SeeDream生成图片"""
         try:
-            print(f"使用火山方舟SeeDream生成图片: {prompt}")
+            logger.debug("使用火山方舟SeeDream生成图片: %s", prompt)
             
             # 根据官方文档使用正确的参数格式
-            response = client.images.generate(
-                model=VOLCANO_IMAGE_MODEL,
+            model, size = _VOLCANO_SERVICE_IMAGE
+            response = await _generate_volcano_images(
+                model=model,
                 prompt=prompt,
-                size="1024x1024",  # 使用标准尺寸格式
+                size=size,
                 n=1,  # 生成图片数量
                 response_format="url"  # 返回URL格式
             )
             
-            print(f"火山方舟API响应: {response}")
+            logger.debug("火山方舟API响应: %s", response)
             
             # 处理响应格式
             if hasattr(response, 'data') and response.data and len(response.data) > 0:
                 image_url = response.data[0].url
-                print(f"火山方舟图片生成成功: {image_url}")
+                logger.debug("火山方舟图片生成成功: %s", image_url)
                 return image_url
             elif hasattr(response, 'images') and response.images and len(response.images) > 0:
                 image_url = response.images[0].url if hasattr(response.images[0], 'url') else response.images[0]
-                print(f"火山方舟图片生成成功: {image_url}")
+                logger.debug("火山方舟图片生成成功: %s", image_url)
                 return image_url
             else:
-                print(f"火山方舟API响应格式异常: {response}")
-                # 尝试直接访问response的其他可能属性
-                print(f"Response类型: {type(response)}")
-                print(f"Response属性: {dir(response)}")
+                logger.warning("火山方舟API响应格式异常 (%s): %s", type(response).__name__, response)
                 raise Exception("API响应格式异常")
                 
         except Exception as e:
-            print(f"火山方舟图片生成失败: {e}")
-            print(f"错误类型: {type(e)}")
+            logger.error("火山方舟图片生成失败 (%s): %s", type(e).__name__, e)
             raise e
 
     async def _generate_with_openai(self, prompt: str) -> str:
         """使用OpenAI DALL-E生成图片"""
         try:
-            response = openai.images.generate(
-                model="dall-e-3",
-                prompt=prompt,
-                size="768x1024",  # 小红书风格的3:4比例
-                quality="standard",
-                n=1,
-            )
+            async with _PROVIDER_LIMITERS["openai"]:
+                model, size = _OPENAI_SERVICE_IMAGE
+                response = await asyncio.to_thread(
+                    openai.images.generate,
+                    model=model,
+                    prompt=prompt,
+                    size=size,
+                    quality="standard",
+                    n=1,
+                )
             return response.data[0].url
         except Exception as e:
-            print(f"OpenAI图片生成失败: {e}")
+            logger.error("OpenAI图片生成失败: %s", e)
             raise
     
     async def _generate_with_baidu(self, prompt: str) -> str:
         """使用百度文心一格生成图片"""
         # 这里需要实现百度文心一格的API调用
         # 暂时返回占位图片
-        return f"https://picsum.photos/800/600?random={hash(prompt) % 10000}"
+        return f"https://picsum.photos/800/600?random={_stable_bucket(prompt, 10000)}"
     
     async def _generate_with_ali(self, prompt: str) -> str:
         """使用阿里通义万相生成图片"""
         # 这里需要实现阿里通义万相的API调用
         # 暂时返回占位图片
-        return f"https://picsum.photos/800/600?random={hash(prompt) % 10000}"
+        return f"https://picsum.photos/800/600?random={_stable_bucket(prompt, 10000)}"
     
     async def _generate_demo_image(self, prompt: str, segment_id: int) -> str:
         """
         生成演示图片（使用预设图片库）- 智能解析AI提示词版本
         """
-        print(f"\n=== 智能图片匹配分析 段落{segment_id} ===")
-        print(f"AI生成的图片提示词: {prompt}")
-        
-        # 增强版主题映射 - 基于AI描述的语义理解
-        enhanced_theme_mapping = {
-            # 自然风光类 - 扩展语义词汇
-            'nature_mountain': {
-                'keywords': ['山', '山峰', '山脉', '登山', '远足', '自然风光', '户外', '徒步', '山景', '高山', '雪山', '山顶', '峰峦', '巍峨', '壮丽'],
-                'semantic': ['雄伟', '壮观', '高耸', '险峻', '云雾缭绕', '山川', '峻岭', '巅峰', '登高', '俯瞰'],
-                'emotions': ['震撼', '敬畏', '征服', '挑战', '坚毅']
-            },
-            'nature_ocean': {
-                'keywords': ['海', '海洋', '海边', '海滩', '波浪', '海水', '沙滩', '海岸', '蓝色', '水面', '大海', '海浪', '潮汐', '海风'],
-                'semantic': ['辽阔', '深邃', '波涛', '浪花', '海天一色', '碧波', '汹涌', '宁静', '海鸥', '帆船'],
-                'emotions': ['自由', '宁静', '浪漫', '思考', '放松']
-            },
-            'nature_forest': {
-                'keywords': ['森林', '树林', '绿色', '植物', '叶子', '树木', '自然', '绿意', '清新', '大树', '古树', '林间', '丛林', '绿荫'],
-                'semantic': ['茂密', '幽静', '生机', '翠绿', '阳光透过', '鸟语花香', '小径', '清香', '氧气', '生态'],
-                'emotions': ['平静', '治愈', '清新', '生机', '和谐']
-            },
-            'nature_flower': {
-                'keywords': ['花', '花朵', '樱花', '梅花', '玫瑰', '花园', '花海', '盛开', '花瓣', '花蕊', '鲜花', '花束', '绽放', '芬芳'],
-                'semantic': ['娇艳', '芬芳', '绚烂', '花香', '蜜蜂', '蝴蝶', '花期', '花语', '美丽', '色彩'],
-                'emotions': ['美好', '浪漫', '温柔', '纯真', '爱情']
-            },
-            'nature_sky': {
-                'keywords': ['天空', '云', '蓝天', '白云', '晴天', '日出', '日落', '夕阳', '朝霞', '晚霞', '彩霞', '阳光', '云朵', '天际'],
-                'semantic': ['广阔', '无垠', '变幻', '光影', '色彩', '云卷云舒', '霞光', '金辉', '蔚蓝', '纯净'],
-                'emotions': ['希望', '自由', '梦想', '开阔', '向往']
-            },
-            
-            # 城市生活类
-            'city_modern': {
-                'keywords': ['城市', '都市', '现代', '高楼', '建筑', '街道', '都市风光', '摩天大楼', '现代建筑', '玻璃幕墙', '钢筋混凝土'],
-                'semantic': ['繁华', '现代化', '科技感', '都市节奏', '商业区', 'CBD', '天际线', '灯火辉煌', '车水马龙'],
-                'emotions': ['活力', '忙碌', '现代', '进步', '竞争']
-            },
-            'city_street': {
-                'keywords': ['街道', '马路', '路', '街景', '城市街道', '行人', '交通', '繁华', '十字路口', '车流', '人流', '商店'],
-                'semantic': ['熙熙攘攘', '川流不息', '红绿灯', '斑马线', '店铺', '招牌', '街头', '都市生活'],
-                'emotions': ['热闹', '生活', '忙碌', '多彩', '真实']
-            },
-            'city_cafe': {
-                'keywords': ['咖啡厅', '咖啡', '咖啡馆', '温暖', '惬意', '休闲', '下午茶', '咖啡店', '温馨', '拿铁', '卡布奇诺'],
-                'semantic': ['慢生活', '文艺', '小资', '聊天', '阅读', '音乐', '香气', '舒适', '放松'],
-                'emotions': ['惬意', '温馨', '放松', '享受', '文艺']
-            },
-            'city_night': {
-                'keywords': ['夜晚', '夜景', '灯光', '霓虹', '夜色', '城市夜景', '璀璨', '霓虹灯', '灯火通明', '夜生活'],
-                'semantic': ['绚烂', '迷人', '光影', '夜市', '酒吧', '夜店', '星光', '月光', '灯红酒绿'],
-                'emotions': ['浪漫', '神秘', '活力', '魅力', '梦幻']
-            },
-            
-            # 人物情感类
-            'people_portrait': {
-                'keywords': ['人物', '肖像', '面部', '表情', '眼神', '人像', '特写', '面容', '神情', '五官', '轮廓'],
-                'semantic': ['深邃', '专注', '凝视', '微表情', '个性', '气质', '魅力', '特征', '神韵'],
-                'emotions': ['专注', '深沉', '个性', '魅力', '真实']
-            },
-            'people_happy': {
-                'keywords': ['快乐', '开心', '笑容', '微笑', '欢乐', '愉快', '高兴', '兴奋', '喜悦', '幸福', '灿烂', '甜美'],
-                'semantic': ['阳光', '灿烂', '感染力', '正能量', '活力', '青春', '纯真', '美好'],
-                'emotions': ['快乐', '幸福', '满足', '阳光', '积极']
-            },
-            'people_sad': {
-                'keywords': ['伤心', '难过', '悲伤', '忧郁', '沮丧', '失落', '眼泪', '哭泣', '忧伤', '孤独', '思念'],
-                'semantic': ['忧郁', '深沉', '思考', '回忆', '怀念', '感伤', '眼泪', '孤单'],
-                'emotions': ['悲伤', '忧郁', '思念', '孤独', '感伤']
-            },
-            'people_love': {
-                'keywords': ['爱情', '浪漫', '情侣', '恋人', '拥抱', '亲吻', '甜蜜', '温馨', '爱', '浪漫', '约会', '牵手'],
-                'semantic': ['甜蜜', '温馨', '浪漫', '幸福', '相伴', '依偎', '深情', '眷恋'],
-                'emotions': ['爱情', '浪漫', '甜蜜', '幸福', '温暖']
-            },
-            'people_friendship': {
-                'keywords': ['友谊', '朋友', '友情', '陪伴', '一起', '合影', '友好', '聚会', '交谈', '分享', '支持'],
-                'semantic': ['真诚', '陪伴', '支持', '分享', '快乐', '信任', '理解', '珍贵'],
-                'emotions': ['友谊', '温暖', '支持', '快乐', '珍贵']
-            },
-            'people_family': {
-                'keywords': ['家庭', '亲情', '父母', '孩子', '家人', '温馨', '团聚', '家', '亲人', '关爱', '呵护'],
-                'semantic': ['温馨', '和睦', '关爱', '呵护', '传承', '责任', '依靠', '港湾'],
-                'emotions': ['温馨', '关爱', '安全', '归属', '责任']
-            },
-            
-            # 生活场景类
-            'life_home': {
-                'keywords': ['家', '家庭', '房间', '客厅', '卧室', '温馨', '居家', '生活', '家居', '装饰', '舒适'],
-                'semantic': ['温馨', '舒适', '私密', '放松', '归属', '安全', '个人空间', '生活气息'],
-                'emotions': ['温馨', '舒适', '安全', '放松', '归属']
-            },
-            'life_work': {
-                'keywords': ['工作', '办公', '电脑', '会议', '商务', '职场', '学习', '专注', '办公室', '效率', '专业'],
-                'semantic': ['专业', '效率', '专注', '认真', '责任', '成就', '挑战', '团队'],
-                'emotions': ['专注', '认真', '责任', '成就', '挑战']
-            },
-            'life_travel': {
-                'keywords': ['旅行', '旅游', '度假', '行李', '机场', '酒店', '风景', '探索', '旅途', '冒险', '发现'],
-                'semantic': ['自由', '探索', '发现', '体验', '冒险', '放松', '开阔', '记忆'],
-                'emotions': ['自由', '兴奋', '探索', '放松', '开阔']
-            },
-            'life_food': {
-                'keywords': ['美食', '食物', '餐厅', '烹饪', '料理', '美味', '餐桌', '品尝', '菜肴', '香味', '色香味'],
-                'semantic': ['美味', '香气', '色彩', '精致', '享受', '满足', '文化', '分享'],
-                'emotions': ['享受', '满足', '幸福', '分享', '文化']
-            },
-            'life_reading': {
-                'keywords': ['读书', '阅读', '书本', '学习', '知识', '图书', '文字', '思考', '书籍', '智慧', '文学'],
-                'semantic': ['安静', '专注', '思考', '智慧', '知识', '成长', '内涵', '修养'],
-                'emotions': ['宁静', '专注', '智慧', '成长', '充实']
-            },
-            
-            # 抽象概念类
-            'abstract_dream': {
-                'keywords': ['梦想', '希望', '未来', '理想', '憧憬', '目标', '追求', '愿望', '梦', '志向', '抱负'],
-                'semantic': ['远大', '美好', '追求', '奋斗', '坚持', '信念', '光明', '可能'],
-                'emotions': ['希望', '憧憬', '激励', '坚定', '美好']
-            },
-            'abstract_memory': {
-                'keywords': ['回忆', '记忆', '过去', '怀念', '思念', '往事', '童年', '青春', '时光', '岁月', '怀旧'],
-                'semantic': ['珍贵', '美好', '怀念', '感慨', '时光', '青春', '纯真', '难忘'],
-                'emotions': ['怀念', '感慨', '珍贵', '温暖', '感伤']
-            },
-            'abstract_growth': {
-                'keywords': ['成长', '进步', '发展', '提升', '改变', '蜕变', '突破', '进化', '成熟', '学习', '进取'],
-                'semantic': ['进步', '提升', '突破', '坚持', '努力', '收获', '成就', '蜕变'],
-                'emotions': ['成就', '满足', '自豪', '坚定', '积极']
-            },
-            'abstract_peace': {
-                'keywords': ['平静', '安静', '宁静', '祥和', '放松', '冥想', '内心', '禅意', '宁静', '静谧', '安详'],
-                'semantic': ['宁静', '平和', '安详', '内心', '冥想', '禅意', '超脱', '纯净'],
-                'emotions': ['平静', '安详', '放松', '纯净', '超脱']
-            },
-            'abstract_emotion': {
-                'keywords': ['情感', '温暖', '感动', '关爱', '温情', '心情', '感受', '情绪', '内心', '心灵', '感触'],
-                'semantic': ['深刻', '真挚', '温暖', '感人', '触动', '共鸣', '理解', '包容'],
-                'emotions': ['感动', '温暖', '真挚', '深刻', '共鸣']
-            },
-            
-            # 季节时间类
-            'season_spring': {
-                'keywords': ['春天', '春季', '新绿', '生机', '复苏', '嫩芽', '春意', '温暖', '春日', '花开', '万物复苏'],
-                'semantic': ['生机', '希望', '新生', '活力', '温暖', '绿意', '花开', '复苏'],
-                'emotions': ['希望', '活力', '新生', '温暖', '美好']
-            },
-            'season_summer': {
-                'keywords': ['夏天', '夏季', '炎热', '阳光', '海滩', '游泳', '清凉', '活力', '夏日', '热情', '火热'],
-                'semantic': ['热情', '活力', '阳光', '热烈', '充满活力', '青春', '激情', '奔放'],
-                'emotions': ['热情', '活力', '激情', '自由', '青春']
-            },
-            'season_autumn': {
-                'keywords': ['秋天', '秋季', '落叶', '金黄', '收获', '枫叶', '萧瑟', '成熟', '金秋', '丰收', '凉爽'],
-                'semantic': ['成熟', '收获', '丰富', '沉淀', '金黄', '美丽', '诗意', '感怀'],
-                'emotions': ['成熟', '收获', '感怀', '诗意', '沉静']
-            },
-            'season_winter': {
-                'keywords': ['冬天', '冬季', '雪', '寒冷', '雪花', '冰', '纯洁', '静谧', '雪景', '银装素裹', '洁白'],
-                'semantic': ['纯洁', '静谧', '洁白', '宁静', '素雅', '清冷', '美丽', '神圣'],
-                'emotions': ['纯洁', '宁静', '清冷', '神圣', '美丽']
-            },
-            
-            # 活动行为类
-            'activity_sport': {
-                'keywords': ['运动', '健身', '跑步', '瑜伽', '游泳', '锻炼', '活力', '健康', '体育', '汗水', '坚持'],
-                'semantic': ['活力', '健康', '坚持', '挑战', '突破', '汗水', '努力', '强健'],
-                'emotions': ['活力', '健康', '坚持', '挑战', '成就']
-            },
-            'activity_art': {
-                'keywords': ['艺术', '绘画', '音乐', '创作', '设计', '美术', '文艺', '创意', '艺术', '灵感', '美感'],
-                'semantic': ['创意', '美感', '灵感', '表达', '创造', '艺术', '文化', '审美'],
-                'emotions': ['创意', '美感', '表达', '文艺', '灵感']
-            },
-            'activity_relax': {
-                'keywords': ['休息', '放松', '躺着', '睡觉', '安静', '舒适', '惬意', '慵懒', '休闲', '悠闲', '享受'],
-                'semantic': ['舒适', '惬意', '悠闲', '放松', '享受', '慵懒', '安逸', '自在'],
-                'emotions': ['放松', '舒适', '惬意', '悠闲', '享受']
-            },
-            
-            # 动物宠物类
-            'animal_cat': {
-                'keywords': ['猫', '小猫', '猫咪', '喵星人', '可爱猫', '宠物猫', '猫咪', '喵喵'],
-                'semantic': ['可爱', '温顺', '优雅', '独立', '神秘', '灵动', '治愈', '陪伴'],
-                'emotions': ['可爱', '治愈', '温顺', '陪伴', '温暖']
-            },
-            'animal_dog': {
-                'keywords': ['狗', '小狗', '狗狗', '宠物狗', '忠诚', '汪星人', '犬', '小犬'],
-                'semantic': ['忠诚', '友好', '活泼', '陪伴', '守护', '可爱', '温暖', '信任'],
-                'emotions': ['忠诚', '友好', '陪伴', '温暖', '信任']
-            },
-            'animal_bird': {
-                'keywords': ['鸟', '小鸟', '飞鸟', '鸟儿', '翅膀', '飞翔', '鸟类', '羽毛'],
-                'semantic': ['自由', '轻盈', '优雅', '飞翔', '歌声', '美丽', '灵动', '天空'],
-                'emotions': ['自由', '轻盈', '优雅', '美丽', '灵动']
-            },
-            'animal_wild': {
-                'keywords': ['野生动物', '兔子', '松鼠', '蝴蝶', '昆虫', '动物', '野生', '自然'],
-                'semantic': ['自然', '野性', '生态', '和谐', '美丽', '神奇', '多样', '生命'],
-                'emotions': ['自然', '和谐', '美丽', '神奇', '生命']
-            }
-        }
-        
-        # 智能语义分析算法
-        theme_scores = {}
-        prompt_text = prompt.lower()
-        
-        # 提取AI描述中的关键信息
-        ai_description_analysis = self._analyze_ai_description(prompt_text)
-        print(f"AI描述分析结果: {ai_description_analysis}")
-        
-        # 基于增强主题映射进行智能匹配
-        for theme, theme_data in enhanced_theme_mapping.items():
-            score = 0
-            
-            # 1. 关键词匹配 (权重: 40%)
-            keyword_score = 0
-            for keyword in theme_data['keywords']:
-                if keyword in prompt_text:
-                    # 精确匹配加分
-                    keyword_score += 3
-                    # 位置权重：出现在前面的词权重更高
-                    position = prompt_text.find(keyword)
-                    if position < len(prompt_text) * 0.3:  # 前30%位置
-                        keyword_score += 1
-                    # 频率权重：多次出现加分
-                    frequency = prompt_text.count(keyword)
-                    keyword_score += min(frequency - 1, 2)  # 最多额外加2分
-            
-            # 2. 语义词汇匹配 (权重: 30%)
-            semantic_score = 0
-            for semantic_word in theme_data['semantic']:
-                if semantic_word in prompt_text:
-                    semantic_score += 2
-                    # 语义词汇的上下文相关性
+        cache_key = (prompt, segment_id % _DEMO_IMAGE_VARIANTS)
+        image_url = _demo_url_cache.get(cache_key)
+        if image_url is not None:
+            _demo_url_cache.move_to_end(cache_key)
+            return image_url
+        # 主题打分是纯CPU计算，放到线程中执行，避免阻塞事件循环
+        image_url = await asyncio.to_thread(_pick_demo_url, *cache_key)
+        _lru_remember(_demo_url_cache, cache_key, image_url, _DEMO_URL_CACHE_SIZE)
+        return image_url
+    
+    # 图片合成功能
+
+# 演示图片选择结果缓存：(提示词, 段落序号 % _DEMO_IMAGE_VARIANTS) -> 图片URL，命中时不再进入线程打分
+_DEMO_IMAGE_VARIANTS = 5
+_DEMO_URL_CACHE_SIZE = 4096
+_demo_url_cache: "OrderedDict[tuple, str]" = OrderedDict()
+
+def _lru_remember(cache: OrderedDict, key, value, max_size: int):
+    """写入进程内LRU，超出max_size时淘汰最久未使用的条目"""
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > max_size:
+        cache.popitem(last=False)
+
+def _pick_demo_url(prompt: str, salt: int) -> str:
+    """
+    为提示词打分并选出演示图片，结果只取决于入参（纯CPU计算，由调用方缓存并放到线程中执行）
+    salt: 段落序号对 _DEMO_IMAGE_VARIANTS 取模，同一提示词最多对应这么多张不同图片
+    """
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
+    if debug_enabled:
+        logger.debug("=== 智能图片匹配分析 salt=%s ===", salt)
+        logger.debug("AI生成的图片提示词: %s", prompt)
+    
+    # 智能语义分析算法
+    theme_scores = {}
+    prompt_text = prompt.lower()
+    
+    # 单次扫描提示词，得到所有命中词汇及其位置
+    keyword_positions = _PROMPT_SCANNER.find_positions(prompt_text)
+    
+    # 提取AI描述中的关键信息
+    ai_description_analysis = _analyze_ai_description(prompt_text, keyword_positions)
+    logger.debug("AI描述分析结果: %s", ai_description_analysis)
+    bucket_scores = {theme: dict.fromkeys(_THEME_BUCKETS, 0) for theme in _ENHANCED_THEME_MAPPING}
+    context_words = None
+    
+    for matched_word, positions in keyword_positions.items():
+        for theme, bucket in _THEME_KEYWORD_INDEX.get(matched_word, ()):
+            if bucket == 'keywords':
+                # 1. 关键词匹配 (权重: 40%) - 精确匹配加分
+                score = 3
+                # 位置权重：出现在前面的词权重更高
+                if positions[0] < len(prompt_text) * 0.3:  # 前30%位置
+                    score += 1
+                # 频率权重：多次出现加分
+                frequency = _count_non_overlapping(positions, len(matched_word))
+                score += min(frequency - 1, 2)  # 最多额外加2分
+            elif bucket == 'semantic':
+                # 2. 语义词汇匹配 (权重: 30%)
+                score = 2
+                # 语义词汇的上下文相关性
+                if context_words is None:
                     context_words = prompt_text.split()
-                    word_index = -1
-                    for i, word in enumerate(context_words):
-                        if semantic_word in word:
-                            word_index = i
-                            break
-                    if word_index >= 0:
-                        # 检查前后词汇的相关性
-                        context_start = max(0, word_index - 2)
-                        context_end = min(len(context_words), word_index + 3)
-                        context = ' '.join(context_words[context_start:context_end])
-                        for related_word in theme_data['keywords'][:5]:  # 检查前5个关键词
-                            if related_word in context:
-                                semantic_score += 1
-                                break
-            
-            # 3. 情感词汇匹配 (权重: 20%)
-            emotion_score = 0
-            for emotion in theme_data['emotions']:
-                if emotion in prompt_text:
-                    emotion_score += 2
-                    # 情感强度分析
-                    emotion_context = self._get_emotion_context(prompt_text, emotion)
-                    if emotion_context:
-                        emotion_score += 1
-            
-            # 4. AI描述分析加分 (权重: 10%)
-            ai_analysis_score = 0
-            if ai_description_analysis:
-                # 场景匹配
-                if 'scene_type' in ai_description_analysis:
-                    scene_type = ai_description_analysis['scene_type']
-                    if any(scene_word in theme for scene_word in scene_type.split('_')):
-                        ai_analysis_score += 3
-                
-                # 情感匹配
-                if 'dominant_emotion' in ai_description_analysis:
-                    dominant_emotion = ai_description_analysis['dominant_emotion']
-                    if dominant_emotion in theme_data['emotions']:
-                        ai_analysis_score += 2
-                
-                # 视觉元素匹配
-                if 'visual_elements' in ai_description_analysis:
-                    visual_elements = ai_description_analysis['visual_elements']
-                    for element in visual_elements:
-                        if element in theme_data['keywords'] or element in theme_data['semantic']:
-                            ai_analysis_score += 1
-            
-            # 计算总分 (加权平均)
-            total_score = (
-                keyword_score * 0.4 +
-                semantic_score * 0.3 +
-                emotion_score * 0.2 +
-                ai_analysis_score * 0.1
-            )
-            
-            theme_scores[theme] = total_score
-            
-            if total_score > 0:
-                 print(f"主题 {theme}: 总分={total_score:.2f} (关键词={keyword_score:.1f}, 语义={semantic_score:.1f}, 情感={emotion_score:.1f}, AI分析={ai_analysis_score:.1f})")
-        
-        # 选择最佳匹配主题
-        if theme_scores:
-            best_theme = max(theme_scores.items(), key=lambda x: x[1])
-            selected_theme = best_theme[0]
-            best_score = best_theme[1]
-            print(f"\n选中最佳主题: {selected_theme} (得分: {best_score:.2f})")
-        else:
-            # 智能默认主题选择
-            selected_theme = self._get_intelligent_default_theme(prompt_text)
-            print(f"\n使用智能默认主题: {selected_theme}")
+                word_index = next((i for i, word in enumerate(context_words) if matched_word in word), -1)
+                if word_index >= 0:
+                    # 检查前后词汇的相关性
+                    context_start = max(0, word_index - 2)
+                    context_end = min(len(context_words), word_index + 3)
+                    context = ' '.join(context_words[context_start:context_end])
+                    # 检查前5个关键词
+                    if any(related_word in context for related_word in _ENHANCED_THEME_MAPPING[theme]['keywords'][:5]):
+                        score += 1
+            else:
+                # 3. 情感词汇匹配 (权重: 20%)
+                # 情感词不含空白，命中即必然落在某个分词内，上下文加分恒成立
+                score = 2 + 1
+            bucket_scores[theme][bucket] += score
+    
+    # 基于增强主题映射汇总得分
+    for theme, theme_data in _ENHANCED_THEME_MAPPING.items():
+        keyword_score = bucket_scores[theme]['keywords']
+        semantic_score = bucket_scores[theme]['semantic']
+        emotion_score = bucket_scores[theme]['emotions']
         
-        # 小红书风格竖版图片库 - 扩展版
-        xiaohongshu_images = {
-            # 自然风光类
-            'nature_mountain': [
-                'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1464822759844-d150baec0494?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1519904981063-b0cf448d479e?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1551632811-561732d1e306?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1506197603052-3cc9c3a201bd?w=400&h=600&fit=crop'
-            ],
-            'nature_ocean': [
-                'https://images.unsplash.com/photo-1505142468610-359e7d316be0?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1544551763-46a013bb70d5?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1507525428034-b723cf961d3e?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1518837695005-2083093ee35b?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1439066615861-d1af74d74000?w=400&h=600&fit=crop'
-            ],
-            'nature_forest': [
-                'https://images.unsplash.com/photo-1441974231531-c6227db76b6e?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1448375240586-882707db888b?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1518837695005-2083093ee35b?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1511593358241-7eea1f3c84e5?w=400&h=600&fit=crop'
-            ],
-            'nature_flower': [
-                'https://images.unsplash.com/photo-1490750967868-88aa4486c946?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1518895949257-7621c3c786d7?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1463320726281-696a485928c7?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1502082553048-f009c37129b9?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop'
-            ],
-            'nature_sky': [
-                'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1500382017468-9049fed747ef?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1519904981063-b0cf448d479e?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1506197603052-3cc9c3a201bd?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1464822759844-d150baec0494?w=400&h=600&fit=crop'
-            ],
+        # 4. AI描述分析加分 (权重: 10%)
+        ai_analysis_score = 0
+        if ai_description_analysis:
+            # 场景匹配
+            if 'scene_type' in ai_description_analysis:
+                scene_type = ai_description_analysis['scene_type']
+                if any(scene_word in theme for scene_word in scene_type.split('_')):
+                    ai_analysis_score += 3
             
-            # 城市生活类
-            'city_modern': [
-                'https://images.unsplash.com/photo-1449824913935-59a10b8d2000?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1486406146926-c627a92ad1ab?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1477959858617-67f85cf4f1df?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1514565131-fce0801e5785?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1480714378408-67cf0d13bc1f?w=400&h=600&fit=crop'
-            ],
-            'city_street': [
-                'https://images.unsplash.com/photo-1477959858617-67f85cf4f1df?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1514565131-fce0801e5785?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1449824913935-59a10b8d2000?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1486406146926-c627a92ad1ab?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1480714378408-67cf0d13bc1f?w=400&h=600&fit=crop'
-            ],
-            'city_cafe': [
-                'https://images.unsplash.com/photo-1501339847302-ac426a4a7cbb?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1554118811-1e0d58224f24?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1495474472287-4d71bcdd2085?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1559056199-641a0ac8b55e?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1521017432531-fbd92d768814?w=400&h=600&fit=crop'
-            ],
-            'city_night': [
-                'https://images.unsplash.com/photo-1514565131-fce0801e5785?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1477959858617-67f85cf4f1df?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1449824913935-59a10b8d2000?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1486406146926-c627a92ad1ab?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1480714378408-67cf0d13bc1f?w=400&h=600&fit=crop'
-            ],
+            # 情感匹配
+            if 'dominant_emotion' in ai_description_analysis:
+                dominant_emotion = ai_description_analysis['dominant_emotion']
+                if dominant_emotion in theme_data['emotions']:
+                    ai_analysis_score += 2
             
-            # 人物情感类
-            'people_portrait': [
-                'https://images.unsplash.com/photo-1494790108755-2616c6106db4?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1517841905240-472988babdf9?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1500648767791-00dcc994a43e?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1438761681033-6461ffad8d80?w=400&h=600&fit=crop'
-            ],
-            'people_happy': [
-                'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1517841905240-472988babdf9?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1500648767791-00dcc994a43e?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1494790108755-2616c6106db4?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1438761681033-6461ffad8d80?w=400&h=600&fit=crop'
-            ],
-            'people_sad': [
-                'https://images.unsplash.com/photo-1494790108755-2616c6106db4?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1517841905240-472988babdf9?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1500648767791-00dcc994a43e?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1438761681033-6461ffad8d80?w=400&h=600&fit=crop'
-            ],
-            'people_love': [
-                'https://images.unsplash.com/photo-1516589178581-6cd7833ae3b2?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1518568814500-bf0f8d125f46?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1517841905240-472988babdf9?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1500648767791-00dcc994a43e?w=400&h=600&fit=crop'
-            ],
-            'people_friendship': [
-                'https://images.unsplash.com/photo-1529156069898-49953e39b3ac?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1517841905240-472988babdf9?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1500648767791-00dcc994a43e?w=400&h=600&fit=crop',
-                'https://images.unsplash.com/photo-1494790108755-2616c6106db4?w=400&h=600&fit=crop'
-            ],
-            'people_family': [
-                 'https://images.unsplash.com/photo-1511895426328-dc8714191300?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1517841905240-472988babdf9?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1500648767791-00dcc994a43e?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1494790108755-2616c6106db4?w=400&h=600&fit=crop'
-             ],
-             
-             # 生活场景类
-             'life_home': [
-                 'https://images.unsplash.com/photo-1586023492125-27b2c045efd7?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1560448204-e02f11c3d0e2?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1556909114-f6e7ad7d3136?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1484154218962-a197022b5858?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1493809842364-78817add7ffb?w=400&h=600&fit=crop'
-             ],
-             'life_work': [
-                 'https://images.unsplash.com/photo-1497032628192-86f99bcd76bc?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1486312338219-ce68d2c6f44d?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1517841905240-472988babdf9?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1500648767791-00dcc994a43e?w=400&h=600&fit=crop'
-             ],
-             'life_travel': [
-                 'https://images.unsplash.com/photo-1488646953014-85cb44e25828?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1464822759844-d150baec0494?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1519904981063-b0cf448d479e?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1551632811-561732d1e306?w=400&h=600&fit=crop'
-             ],
-             'life_food': [
-                 'https://images.unsplash.com/photo-1504674900247-0877df9cc836?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1565299624946-b28f40a0ca4b?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1567620905732-2d1ec7ab7445?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1540189549336-e6e99c3679fe?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1551782450-a2132b4ba21d?w=400&h=600&fit=crop'
-             ],
-             'life_reading': [
-                 'https://images.unsplash.com/photo-1481627834876-b7833e8f5570?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1517841905240-472988babdf9?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1500648767791-00dcc994a43e?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1494790108755-2616c6106db4?w=400&h=600&fit=crop'
-             ],
-             
-             # 抽象概念类
-             'abstract_dream': [
-                 'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1500382017468-9049fed747ef?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1519904981063-b0cf448d479e?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1506197603052-3cc9c3a201bd?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1464822759844-d150baec0494?w=400&h=600&fit=crop'
-             ],
-             'abstract_memory': [
-                 'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1517841905240-472988babdf9?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1500648767791-00dcc994a43e?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1494790108755-2616c6106db4?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1438761681033-6461ffad8d80?w=400&h=600&fit=crop'
-             ],
-             'abstract_growth': [
-                 'https://images.unsplash.com/photo-1490750967868-88aa4486c946?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1518895949257-7621c3c786d7?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1463320726281-696a485928c7?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1502082553048-f009c37129b9?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop'
-             ],
-             'abstract_peace': [
-                 'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1500382017468-9049fed747ef?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1519904981063-b0cf448d479e?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1506197603052-3cc9c3a201bd?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1464822759844-d150baec0494?w=400&h=600&fit=crop'
-             ],
-             'abstract_emotion': [
-                 'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1517841905240-472988babdf9?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1500648767791-00dcc994a43e?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1494790108755-2616c6106db4?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1438761681033-6461ffad8d80?w=400&h=600&fit=crop'
-             ],
-             
-             # 季节时间类
-             'season_spring': [
-                 'https://images.unsplash.com/photo-1490750967868-88aa4486c946?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1518895949257-7621c3c786d7?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1463320726281-696a485928c7?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1502082553048-f009c37129b9?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop'
-             ],
-             'season_summer': [
-                 'https://images.unsplash.com/photo-1505142468610-359e7d316be0?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1544551763-46a013bb70d5?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1507525428034-b723cf961d3e?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1518837695005-2083093ee35b?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1439066615861-d1af74d74000?w=400&h=600&fit=crop'
-             ],
-             'season_autumn': [
-                 'https://images.unsplash.com/photo-1441974231531-c6227db76b6e?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1448375240586-882707db888b?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1518837695005-2083093ee35b?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1511593358241-7eea1f3c84e5?w=400&h=600&fit=crop'
-             ],
-             'season_winter': [
-                 'https://images.unsplash.com/photo-1578662996442-48f60103fc96?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1547036967-23d11aacaee0?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1483664852095-d6cc6870702d?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1464822759844-d150baec0494?w=400&h=600&fit=crop'
-             ],
-             
-             # 活动行为类
-             'activity_sport': [
-                 'https://images.unsplash.com/photo-1571019613454-1cb2f99b2d8b?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1544367567-0f2fcb009e0b?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1517841905240-472988babdf9?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1500648767791-00dcc994a43e?w=400&h=600&fit=crop'
-             ],
-             'activity_art': [
-                 'https://images.unsplash.com/photo-1513475382585-d06e58bcb0e0?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1507003211169-0a1dd7228f2d?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1517841905240-472988babdf9?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1500648767791-00dcc994a43e?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1494790108755-2616c6106db4?w=400&h=600&fit=crop'
-             ],
-             'activity_relax': [
-                 'https://images.unsplash.com/photo-1586023492125-27b2c045efd7?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1560448204-e02f11c3d0e2?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1556909114-f6e7ad7d3136?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1484154218962-a197022b5858?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1493809842364-78817add7ffb?w=400&h=600&fit=crop'
-             ],
-             
-             # 动物宠物类
-             'animal_cat': [
-                 'https://images.unsplash.com/photo-1514888286974-6c03e2ca1dba?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1533738363-b7f9aef128ce?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1574158622682-e40e69881006?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1592194996308-7b43878e84a6?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1518791841217-8f162f1e1131?w=400&h=600&fit=crop'
-             ],
-             'animal_dog': [
-                 'https://images.unsplash.com/photo-1552053831-71594a27632d?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1587300003388-59208cc962cb?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1518717758536-85ae29035b6d?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1583337130417-3346a1be7dee?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1561037404-61cd46aa615b?w=400&h=600&fit=crop'
-             ],
-             'animal_bird': [
-                 'https://images.unsplash.com/photo-1444464666168-49d633b86797?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1520637836862-4d197d17c55a?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1464822759844-d150baec0494?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1519904981063-b0cf448d479e?w=400&h=600&fit=crop'
-             ],
-             'animal_wild': [
-                 'https://images.unsplash.com/photo-1474511320723-9a56873867b5?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1558618666-fcd25c85cd64?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1506905925346-21bda4d32df4?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1464822759844-d150baec0494?w=400&h=600&fit=crop',
-                 'https://images.unsplash.com/photo-1519904981063-b0cf448d479e?w=400&h=600&fit=crop'
-             ]
-         }
-         
-        # 根据选中主题和段落ID选择图片
-        if selected_theme in xiaohongshu_images:
-            theme_images = xiaohongshu_images[selected_theme]
-        else:
-            # 默认使用自然风光图片
-            theme_images = xiaohongshu_images['nature_sky']
-         
-        # 使用哈希算法确保同一段落总是选择相同的图片
-        import hashlib
-        hash_input = f"{prompt}_{segment_id}".encode('utf-8')
-        hash_value = int(hashlib.md5(hash_input).hexdigest(), 16)
-        image_index = hash_value % len(theme_images)
-        selected_image = theme_images[image_index]
-        
-        print(f"选择图片: {selected_image} (索引: {image_index})")
-        print(f"=== 图片匹配完成 ===")
-        
-        return selected_image
-
-    def _analyze_ai_description(self, prompt_text: str) -> dict:
-        """
-        分析AI生成的图片描述，提取关键信息
-        """
-        analysis = {
-            'scene_type': 'general',
-            'dominant_emotion': 'neutral',
-            'visual_elements': []
-        }
-        
-        # 场景类型分析
-        scene_keywords = {
-            'nature_mountain': ['山', '山峰', '山脉', '高山', '雪山', '峰峦', '登山', '徒步'],
-            'nature_ocean': ['海', '海洋', '海滩', '海岸', '波浪', '海水', '沙滩', '海边'],
-            'nature_forest': ['森林', '树林', '树木', '绿色', '叶子', '植物', '自然'],
-            'nature_flower': ['花', '花朵', '花园', '鲜花', '花瓣', '盛开', '绽放'],
-            'nature_sky': ['天空', '云', '云朵', '蓝天', '白云', '晴空', '天际'],
-            'city_modern': ['城市', '建筑', '高楼', '现代', '都市', '摩天大楼'],
-            'city_street': ['街道', '马路', '街景', '商店', '行人', '车辆'],
-            'lifestyle_food': ['食物', '美食', '餐厅', '菜品', '料理', '烹饪'],
-            'lifestyle_travel': ['旅行', '旅游', '景点', '度假', '探索', '冒险'],
-            'lifestyle_fashion': ['时尚', '服装', '穿搭', '风格', '潮流', '搭配'],
-            'animal_pet': ['宠物', '猫', '狗', '动物', '可爱', '毛茸茸'],
-            'animal_bird': ['鸟', '小鸟', '飞鸟', '翅膀', '飞翔', '羽毛'],
-            'animal_wild': ['野生动物', '兔子', '松鼠', '蝴蝶', '昆虫', '野生']
-        }
+            # 视觉元素匹配
+            if 'visual_elements' in ai_description_analysis:
+                visual_words = _THEME_VISUAL_WORDS[theme]
+                for element in ai_description_analysis['visual_elements']:
+                    if element in visual_words:
+                        ai_analysis_score += 1
         
-        for scene_type, keywords in scene_keywords.items():
-            for keyword in keywords:
-                if keyword in prompt_text:
-                    analysis['scene_type'] = scene_type
-                    break
-            if analysis['scene_type'] != 'general':
-                break
+        # 计算总分 (加权平均)
+        total_score = (
+            keyword_score * 0.4 +
+            semantic_score * 0.3 +
+            emotion_score * 0.2 +
+            ai_analysis_score * 0.1
+        )
         
-        # 情感分析
-        emotion_keywords = {
-            '温暖': ['温暖', '温馨', '舒适', '柔和', '亲切'],
-            '宁静': ['宁静', '安静', '平静', '祥和', '静谧'],
-            '活力': ['活力', '生机', '充满', '活跃', '动感'],
-            '浪漫': ['浪漫', '唯美', '梦幻', '美丽', '优雅'],
-            '神秘': ['神秘', '深邃', '朦胧', '幽深', '隐秘'],
-            '壮观': ['壮观', '雄伟', '壮丽', '震撼', '宏伟']
-        }
+        theme_scores[theme] = total_score
         
-        for emotion, keywords in emotion_keywords.items():
-            for keyword in keywords:
-                if keyword in prompt_text:
-                    analysis['dominant_emotion'] = emotion
-                    break
-            if analysis['dominant_emotion'] != 'neutral':
+        if debug_enabled and total_score > 0:
+            logger.debug("主题 %s: 总分=%.2f (关键词=%.1f, 语义=%.1f, 情感=%.1f, AI分析=%.1f)",
+                         theme, total_score, keyword_score, semantic_score, emotion_score, ai_analysis_score)
+    
+    # 选择最佳匹配主题
+    if theme_scores:
+        best_theme = max(theme_scores.items(), key=lambda x: x[1])
+        selected_theme = best_theme[0]
+        best_score = best_theme[1]
+        logger.debug("选中最佳主题: %s (得分: %.2f)", selected_theme, best_score)
+    else:
+        # 智能默认主题选择
+        selected_theme = _get_intelligent_default_theme(prompt_text, keyword_positions)
+        logger.debug("使用智能默认主题: %s", selected_theme)
+    
+    # 根据选中主题和salt选择图片
+    if selected_theme in _XIAOHONGSHU_IMAGES:
+        theme_images = _XIAOHONGSHU_IMAGES[selected_theme]
+    else:
+        # 默认使用自然风光图片
+        theme_images = _XIAOHONGSHU_IMAGES['nature_sky']
+    
+    # 使用哈希算法确保同一段落总是选择相同的图片（CRC32即可，无需密码学哈希）
+    hash_value = zlib.crc32(str(salt).encode('utf-8'), zlib.crc32(prompt.encode('utf-8')))
+    image_index = hash_value % len(theme_images)
+    selected_image = theme_images[image_index]
+    
+    logger.debug("选择图片: %s (索引: %s)", selected_image, image_index)
+    
+    return selected_image
+
+def _analyze_ai_description(prompt_text: str, keyword_positions: Optional[Dict[str, List[int]]] = None) -> dict:
+    """
+    分析AI生成的图片描述，提取关键信息
+    keyword_positions: 主题打分时已得到的单次扫描结果，为空时重新扫描
+    """
+    if keyword_positions is None:
+        keyword_positions = _PROMPT_SCANNER.find_positions(prompt_text)
+    
+    analysis = {
+        'scene_type': 'general',
+        'dominant_emotion': 'neutral',
+        'visual_elements': []
+    }
+    
+    # 场景类型分析
+    for scene_type, keywords in _AI_SCENE_KEYWORDS.items():
+        if any(keyword in keyword_positions for keyword in keywords):
+            analysis['scene_type'] = scene_type
+            break
+    
+    # 情感分析
+    for emotion, keywords in _AI_EMOTION_KEYWORDS.items():
+        if any(keyword in keyword_positions for keyword in keywords):
+            analysis['dominant_emotion'] = emotion
+            break
+    
+    # 视觉元素提取
+    analysis['visual_elements'] = [element for element in _AI_ELEMENT_KEYWORDS if element in keyword_positions]
+    
+    return analysis
+
+def _get_intelligent_default_theme(prompt_text: str, keyword_positions: Optional[Dict[str, List[int]]] = None) -> str:
+    """
+    智能选择默认主题
+    keyword_positions: 主题打分时已得到的单次扫描结果，为空时重新扫描
+    """
+    if keyword_positions is None:
+        keyword_positions = _PROMPT_SCANNER.find_positions(prompt_text)
+    
+    # 基于文本内容的简单分类
+    for theme, words in _DEFAULT_THEME_KEYWORDS:
+        if any(word in keyword_positions for word in words):
+            return theme
+    return 'nature_sky'  # 默认自然风光
+
+def _write_file_atomic(directory: str, path: str, data: bytes):
+    """先写临时文件再原子替换，避免并发请求读到半个文件（同步磁盘IO，由调用方放到线程中执行）"""
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as temp_file:
+        temp_file.write(data)
+    os.replace(temp_file.name, path)
+
+def _sweep_cache_dir(directory: str, max_age: int, max_bytes: int, sidecar_max_age: Optional[int] = None) -> int:
+    """
+    清理一个磁盘缓存目录，返回删除的文件数（同步磁盘IO，由调用方放到线程中执行）
+    先删除修改时间超过max_age秒的文件，总大小仍超过max_bytes时从最旧的文件开始删除；
+    sidecar_max_age: .src代理映射文件的保留秒数（为空时同max_age）
+    多个worker可能同时清理，已被删除的文件直接跳过
+    """
+    now = time.time()
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0
+    
+    removed = 0
+    kept = []
+    total_bytes = 0
+    for entry in entries:
+        try:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            stat = entry.stat(follow_symlinks=False)
+            file_max_age = sidecar_max_age if sidecar_max_age is not None and entry.name.endswith(".src") else max_age
+            if stat.st_mtime + file_max_age < now:
+                os.remove(entry.path)
+                removed += 1
+                continue
+        except FileNotFoundError:
+            continue
+        kept.append((stat.st_mtime, stat.st_size, entry.path))
+        total_bytes += stat.st_size
+    
+    if total_bytes > max_bytes:
+        kept.sort()
+        for mtime, size, path in kept:
+            # 一分钟内写入的文件可能仍在被原子替换或读取，不因容量淘汰
+            if total_bytes <= max_bytes or mtime > now - 60:
                 break
-        
-        # 视觉元素提取
-        visual_elements = []
-        element_keywords = ['颜色', '光线', '阴影', '纹理', '形状', '线条', '构图', '透视', '对比', '明暗']
-        for element in element_keywords:
-            if element in prompt_text:
-                visual_elements.append(element)
-        
-        analysis['visual_elements'] = visual_elements
-        
-        return analysis
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+    return removed
 
-    def _get_emotion_context(self, prompt_text: str, emotion: str) -> str:
-        """
-        获取情感词汇的上下文
-        """
-        words = prompt_text.split()
-        for i, word in enumerate(words):
-            if emotion in word:
-                start = max(0, i - 2)
-                end = min(len(words), i + 3)
-                return ' '.join(words[start:end])
-        return ""
-
-    def _get_intelligent_default_theme(self, prompt_text: str) -> str:
-        """
-        智能选择默认主题
-        """
-        # 基于文本内容的简单分类
-        if any(word in prompt_text for word in ['自然', '风景', '户外', '天空', '云']):
-            return 'nature_sky'
-        elif any(word in prompt_text for word in ['城市', '建筑', '现代', '都市']):
-            return 'city_modern'
-        elif any(word in prompt_text for word in ['动物', '宠物', '可爱']):
-            return 'animal_pet'
-        elif any(word in prompt_text for word in ['食物', '美食', '料理']):
-            return 'lifestyle_food'
-        else:
-            return 'nature_sky'  # 默认自然风光
+def _sweep_disk_caches():
+    """清理所有磁盘图片缓存目录：原图、合成图、代理图片及其映射（同步磁盘IO，由调用方放到线程中执行）"""
+    for directory in (IMAGE_SOURCE_CACHE_DIR, COMPOSED_IMAGE_DIR, IMAGE_PROXY_CACHE_DIR):
+        # 代理映射在服务商URL过期（IMAGE_CACHE_TTL）后已无用，随之删除
+        removed = _sweep_cache_dir(directory, DISK_CACHE_TTL, DISK_CACHE_MAX_BYTES, sidecar_max_age=IMAGE_CACHE_TTL)
+        if removed:
+            logger.info("清理磁盘缓存 %s: 删除%d个文件", directory, removed)
 
-    # 图片合成功能
+async def _sweep_disk_caches_periodically():
+    """后台定期清理磁盘缓存，直到应用关闭时被取消"""
+    while True:
+        try:
+            await asyncio.to_thread(_sweep_disk_caches)
+        except Exception as e:
+            logger.warning("清理磁盘缓存失败: %s", e)
+        await asyncio.sleep(DISK_CACHE_SWEEP_INTERVAL)
+
+_IMAGE_DOWNLOAD_SEMAPHORE = asyncio.Semaphore(IMAGE_DOWNLOAD_CONCURRENCY)
+_SEGMENT_SEMAPHORE = asyncio.Semaphore(SEEDREAM_CONCURRENCY)
 
 class ImageComposer:
-    """图文合成服务类 - 小红书风格"""
+    """图文合成服务类 - 小红书风格（下载与缓存原图、调度合成；排版绘制见 compose 模块）"""
     
     def __init__(self):
-        # 小红书风格的竖版尺寸比例 (3:4)
-        self.canvas_width = 600
-        self.canvas_height = 800
-        self.padding = 30
-        self.corner_radius = 20
+        # 正在下载中的原图（缓存键 -> 下载任务），同一URL并发请求时只下载一次
+        self._pending_downloads: Dict[str, asyncio.Task] = {}
+        # 合成用进程池，由应用启动时设置；为空时在线程中合成
+        self.process_pool: Optional[ProcessPoolExecutor] = None
+    
+    async def _download_to_cache(self, image_url: str, cached_path: str) -> None:
+        """下载原图并原子写入磁盘缓存"""
+        async with _IMAGE_DOWNLOAD_SEMAPHORE:
+            response = await get_http_client().get(image_url, timeout=10)
+        if response.status_code != 200:
+            raise Exception(f"无法下载图片: {response.status_code}")
+        
+        await asyncio.to_thread(_write_file_atomic, IMAGE_SOURCE_CACHE_DIR, cached_path, response.content)
+    
+    async def _download_cached(self, image_url: str) -> str:
+        """获取原图的本地缓存路径：先查磁盘缓存，未命中再下载并原子落盘"""
+        cache_key = hashlib.sha256(image_url.encode('utf-8')).hexdigest()
+        cached_path = os.path.join(IMAGE_SOURCE_CACHE_DIR, cache_key)
+        
+        if not os.path.exists(cached_path):
+            # 多个段落使用同一张原图时共享同一个下载任务
+            download_task = self._pending_downloads.get(cache_key)
+            if download_task is None:
+                download_task = asyncio.ensure_future(self._download_to_cache(image_url, cached_path))
+                self._pending_downloads[cache_key] = download_task
+                download_task.add_done_callback(lambda _: self._pending_downloads.pop(cache_key, None))
+            # shield：某个等待方被取消时不影响其他段落共享的下载
+            await asyncio.shield(download_task)
+        
+        return cached_path
     
     async def compose_image_text(self, image_url: str, text: str, summary: str) -> str:
-        """合成小红书风格的图文"""
+        """合成小红书风格的图文，返回合成图片的访问地址"""
+        composed_hash = hashlib.sha1(f"{image_url}\n{text}\n{summary}".encode('utf-8')).hexdigest()
+        composed_name = f"{composed_hash}.webp"
+        composed_path = os.path.join(COMPOSED_IMAGE_DIR, composed_name)
+        composed_url = f"/api/composed/{composed_name}"
+        
+        # 相同的原图、文本和摘要已合成过，直接返回
+        if os.path.exists(composed_path):
+            return composed_url
+        
         try:
-            # 下载原图片
-            response = requests.get(image_url, timeout=10)
-            if response.status_code != 200:
-                raise Exception(f"无法下载图片: {response.status_code}")
-            
-            # 打开图片
-            original_image = Image.open(io.BytesIO(response.content))
+            # 获取原图片（磁盘缓存，子进程/线程按路径读取）
+            source_path = await self._download_cached(image_url)
             
-            # 创建画布 - 小红书风格的竖版比例
-            canvas = Image.new('RGB', (self.canvas_width, self.canvas_height), '#FAFAFA')
-            
-            # 调整原图片大小，保持比例并填充大部分画布
-            image_height = int(self.canvas_height * 0.75)  # 图片占75%高度
-            image_width = self.canvas_width - 2 * self.padding
-            
-            # 保持原图比例的同时调整大小
-            original_ratio = original_image.width / original_image.height
-            target_ratio = image_width / image_height
-            
-            if original_ratio > target_ratio:
-                # 原图更宽，以高度为准
-                new_height = image_height
-                new_width = int(new_height * original_ratio)
-                resized_image = original_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                # 居中裁剪
-                crop_x = (new_width - image_width) // 2
-                resized_image = resized_image.crop((crop_x, 0, crop_x + image_width, new_height))
+            # 排版绘制与WebP编码是CPU密集操作：优先在进程池中执行以绕开GIL，否则放到线程中，避免阻塞事件循环
+            if self.process_pool is not None:
+                await asyncio.get_running_loop().run_in_executor(
+                    self.process_pool, compose_to_file, source_path, text, summary, composed_path
+                )
             else:
-                # 原图更高，以宽度为准
-                new_width = image_width
-                new_height = int(new_width / original_ratio)
-                resized_image = original_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                # 居中裁剪
-                crop_y = (new_height - image_height) // 2
-                resized_image = resized_image.crop((0, crop_y, new_width, crop_y + image_height))
-            
-            # 创建圆角图片
-            rounded_image = self._create_rounded_image(resized_image, self.corner_radius)
-            
-            # 将图片粘贴到画布上
-            image_y = self.padding
-            canvas.paste(rounded_image, (self.padding, image_y), rounded_image)
-            
-            # 在图片底部区域添加文字 - 小红书风格
-            draw = ImageDraw.Draw(canvas)
-            
-            # 加载字体
-            try:
-                # Windows系统字体
-                title_font = ImageFont.truetype("msyh.ttc", 20)  # 标题字体
-                content_font = ImageFont.truetype("msyh.ttc", 14)  # 内容字体
-                tag_font = ImageFont.truetype("msyh.ttc", 12)  # 标签字体
-            except:
-                try:
-                    title_font = ImageFont.truetype("arial.ttf", 20)
-                    content_font = ImageFont.truetype("arial.ttf", 14)
-                    tag_font = ImageFont.truetype("arial.ttf", 12)
-                except:
-                    title_font = ImageFont.load_default()
-                    content_font = ImageFont.load_default()
-                    tag_font = ImageFont.load_default()
-            
-            # 文字区域起始位置
-            text_start_y = image_y + image_height + 20
-            text_area_height = self.canvas_height - text_start_y - self.padding
-            
-            # 绘制标题 - 小红书风格的标题
-            title_text = f"✨ {summary}"
-            title_y = text_start_y
-            draw.text((self.padding, title_y), title_text, fill='#2C2C2C', font=title_font)
-            
-            # 绘制内容预览 - 限制行数，添加省略号
-            content_y = title_y + 35
-            max_width = self.canvas_width - 2 * self.padding
+                await asyncio.to_thread(compose_to_file, source_path, text, summary, composed_path)
             
-            # 处理文本内容，添加小红书风格的表情符号
-            processed_text = self._process_text_for_xiaohongshu(text)
-            lines = self._wrap_text(processed_text, content_font, max_width, draw)
-            
-            # 最多显示3行内容
-            max_lines = 3
-            for i, line in enumerate(lines[:max_lines]):
-                line_y = content_y + i * 22
-                if line_y + 22 < self.canvas_height - self.padding - 30:
-                    # 如果是最后一行且还有更多内容，添加省略号
-                    if i == max_lines - 1 and len(lines) > max_lines:
-                        line = line[:30] + "..."
-                    draw.text((self.padding, line_y), line, fill='#666666', font=content_font)
-            
-            # 添加小红书风格的标签
-            tag_y = self.canvas_height - self.padding - 25
-            tags = ["#AI生成", "#创意分享", "#长文本"]
-            tag_x = self.padding
-            
-            for tag in tags:
-                # 绘制标签背景
-                tag_bbox = draw.textbbox((0, 0), tag, font=tag_font)
-                tag_width = tag_bbox[2] - tag_bbox[0] + 16
-                tag_height = 20
-                
-                # 检查是否超出画布宽度
-                if tag_x + tag_width > self.canvas_width - self.padding:
-                    break
-                
-                # 绘制圆角矩形背景
-                self._draw_rounded_rectangle(draw, (tag_x, tag_y, tag_x + tag_width, tag_y + tag_height), 
-                                           fill='#F0F0F0', radius=10)
-                
-                # 绘制标签文字
-                text_x = tag_x + 8
-                text_y = tag_y + 3
-                draw.text((text_x, text_y), tag, fill='#888888', font=tag_font)
-                
-                tag_x += tag_width + 8
-            
-            # 保存合成图片到内存
-            output_buffer = io.BytesIO()
-            canvas.save(output_buffer, format='JPEG', quality=95)
-            output_buffer.seek(0)
-            
-            # 转换为base64编码
-            image_base64 = base64.b64encode(output_buffer.getvalue()).decode('utf-8')
-            return f"data:image/jpeg;base64,{image_base64}"
+            return composed_url
             
         except Exception as e:
-            print(f"小红书风格图文合成失败: {e}")
+            logger.warning("小红书风格图文合成失败: %s", e)
             # 返回原图片URL作为备选
             return image_url
     
-    def _create_rounded_image(self, image: Image.Image, radius: int) -> Image.Image:
-        """创建圆角图片"""
-        # 创建一个带alpha通道的图片
-        rounded = Image.new('RGBA', image.size, (0, 0, 0, 0))
-        
-        # 创建圆角遮罩
-        mask = Image.new('L', image.size, 0)
-        mask_draw = ImageDraw.Draw(mask)
-        mask_draw.rounded_rectangle((0, 0, image.size[0], image.size[1]), radius=radius, fill=255)
-        
-        # 将原图转换为RGBA
-        if image.mode != 'RGBA':
-            image = image.convert('RGBA')
-        
-        # 应用遮罩
-        rounded.paste(image, (0, 0))
-        rounded.putalpha(mask)
-        
-        return rounded
-    
-    def _draw_rounded_rectangle(self, draw, coords, fill, radius):
-        """绘制圆角矩形"""
-        x1, y1, x2, y2 = coords
-        draw.rounded_rectangle((x1, y1, x2, y2), radius=radius, fill=fill)
-    
-    def _process_text_for_xiaohongshu(self, text: str) -> str:
-        """为文本添加小红书风格的处理"""
-        # 限制文本长度
-        if len(text) > 150:
-            text = text[:150] + "..."
-        
-        # 添加一些小红书风格的表情符号（随机）
-        emojis = ["💫", "✨", "🌟", "💖", "🎀", "🌸", "🦋", "🌈"]
-        import random
-        if random.random() < 0.3:  # 30%概率添加表情符号
-            emoji = random.choice(emojis)
-            text = f"{emoji} {text}"
-        
-        return text
-    
-    def _wrap_text(self, text: str, font, max_width: int, draw) -> List[str]:
-        """文字自动换行 - 优化版"""
-        lines = []
-        
-        # 按句号、感叹号、问号等分割
-        sentences = text.replace('。', '。\n').replace('！', '！\n').replace('？', '？\n').split('\n')
-        
-        current_line = ""
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if not sentence:
-                continue
-                
-            # 检查当前行加上新句子是否超宽
-            test_line = current_line + sentence
-            bbox = draw.textbbox((0, 0), test_line, font=font)
-            width = bbox[2] - bbox[0]
-            
-            if width <= max_width:
-                current_line = test_line
-            else:
-                # 如果当前行不为空，先保存当前行
-                if current_line.strip():
-                    lines.append(current_line.strip())
-                
-                # 检查单个句子是否需要进一步分割
-                if len(sentence) > 20:  # 如果句子太长，按字符分割
-                    words = list(sentence)  # 中文按字符分割
-                    current_line = ""
-                    for word in words:
-                        test_line = current_line + word
-                        bbox = draw.textbbox((0, 0), test_line, font=font)
-                        width = bbox[2] - bbox[0]
-                        
-                        if width <= max_width:
-                            current_line = test_line
-                        else:
-                            if current_line:
-                                lines.append(current_line)
-                            current_line = word
-                else:
-                    current_line = sentence
-        
-        # 添加最后一行
-        if current_line.strip():
-            lines.append(current_line.strip())
-        
-        return lines
-
 # 初始化服务
 image_generator = ImageGenerationService()
 image_composer = ImageComposer()
 
+def get_image_service(request: Request) -> ImageGenerationService:
+    """依赖注入：获取启动时注册的图片生成服务"""
+    return request.app.state.image_service
+
+def get_image_composer(request: Request) -> ImageComposer:
+    """依赖注入：获取启动时注册的图文合成服务"""
+    return request.app.state.image_composer
+
 # AI服务函数（待实现具体API调用）
+# 文本类型关键词（三类合并为一个扫描器，一次遍历得到全部命中）
+_NARRATIVE_KEYWORDS = ('故事', '情节', '人物', '对话', '场景', '时间', '地点', '发生', '经历', '遇到')
+_ARGUMENTATIVE_KEYWORDS = ('观点', '论证', '认为', '因为', '所以', '然而', '但是', '首先', '其次', '总之')
+_DESCRIPTIVE_KEYWORDS = ('介绍', '说明', '特点', '功能', '方法', '步骤', '原理', '结构', '组成')
+_TEXT_TYPE_SCANNER = _KeywordScanner(_NARRATIVE_KEYWORDS + _ARGUMENTATIVE_KEYWORDS + _DESCRIPTIVE_KEYWORDS)
+
 def _detect_text_type(text: str) -> str:
     """
     检测文本类型：叙事类、议论类、说明类等
     """
-    narrative_keywords = ['故事', '情节', '人物', '对话', '场景', '时间', '地点', '发生', '经历', '遇到']
-    argumentative_keywords = ['观点', '论证', '认为', '因为', '所以', '然而', '但是', '首先', '其次', '总之']
-    descriptive_keywords = ['介绍', '说明', '特点', '功能', '方法', '步骤', '原理', '结构', '组成']
+    found = _TEXT_TYPE_SCANNER.find_positions(text)
     
-    narrative_score = sum(1 for keyword in narrative_keywords if keyword in text)
-    argumentative_score = sum(1 for keyword in argumentative_keywords if keyword in text)
-    descriptive_score = sum(1 for keyword in descriptive_keywords if keyword in text)
+    narrative_score = sum(1 for keyword in _NARRATIVE_KEYWORDS if keyword in found)
+    argumentative_score = sum(1 for keyword in _ARGUMENTATIVE_KEYWORDS if keyword in found)
+    descriptive_score = sum(1 for keyword in _DESCRIPTIVE_KEYWORDS if keyword in found)
     
     if narrative_score >= argumentative_score and narrative_score >= descriptive_score:
         return 'narrative'  # 叙事类
@@ -1145,6 +1440,11 @@ def _detect_text_type(text: str) -> str:
     else:
         return 'descriptive'  # 说明类
 
+# 分段标记词（预编译为交替正则，每个段落只需一次扫描）
+_SCENE_MARKER_PATTERN = _keyword_pattern(['突然', '接着', '然后', '后来', '最后', '终于', '此时', '这时', '当时', '那天', '第二天'])
+_ARGUMENT_MARKER_PATTERN = _keyword_pattern(['首先', '其次', '再次', '最后', '另外', '此外', '然而', '但是', '因此', '所以'])
+_DIMENSION_MARKER_PATTERN = _keyword_pattern(['外观', '功能', '特点', '优势', '方法', '步骤', '原理', '结构', '用途', '效果'])
+
 def _smart_segment_text(text: str, text_type: str) -> List[str]:
     """
     根据文本类型智能分段
@@ -1153,74 +1453,94 @@ def _smart_segment_text(text: str, text_type: str) -> List[str]:
     
     if text_type == 'narrative':
         # 叙事类：按故事发展阶段、场景转换、人物互动分段
-        scene_markers = ['突然', '接着', '然后', '后来', '最后', '终于', '此时', '这时', '当时', '那天', '第二天']
         dialogue_markers = ['说道', '回答', '问道', '喊道', '笑着说', '严肃地说']
         
-        # 按段落和场景标记分割
+        # 按段落和场景标记分割（段落先收集到列表，落段时再拼接，避免反复复制整段字符串）
         paragraphs = text.split('\n\n')
-        current_segment = ""
+        current_parts = []
+        current_length = 0  # 等于 len('\n\n'.join(current_parts))
         
         for para in paragraphs:
-            if len(current_segment) + len(para) > 1200:  # 控制段落长度
-                if current_segment.strip():
-                    segments.append(current_segment.strip())
-                current_segment = para
+            if current_length + len(para) > 1200:  # 控制段落长度
+                current_segment = '\n\n'.join(current_parts).strip()
+                if current_segment:
+                    segments.append(current_segment)
+                current_parts = [para]
+                current_length = len(para)
+            elif current_length:
+                current_parts.append(para)
+                current_length += 2 + len(para)
             else:
-                current_segment += "\n\n" + para if current_segment else para
+                current_parts = [para]
+                current_length = len(para)
                 
-            # 检查是否有场景转换标记
-            for marker in scene_markers:
-                if marker in para and len(current_segment) > 500:
-                    segments.append(current_segment.strip())
-                    current_segment = ""
-                    break
+            # 检查是否有场景转换标记（先做廉价的长度判断）
+            if current_length > 500 and _SCENE_MARKER_PATTERN.search(para):
+                segments.append('\n\n'.join(current_parts).strip())
+                current_parts = []
+                current_length = 0
         
-        if current_segment.strip():
-            segments.append(current_segment.strip())
+        current_segment = '\n\n'.join(current_parts).strip()
+        if current_segment:
+            segments.append(current_segment)
             
     elif text_type == 'argumentative':
         # 议论类：按论点模块分段
-        argument_markers = ['首先', '其次', '再次', '最后', '另外', '此外', '然而', '但是', '因此', '所以']
-        
         paragraphs = text.split('\n\n')
-        current_segment = ""
+        current_parts = []
+        current_length = 0  # 等于 len('\n\n'.join(current_parts))
         
         for para in paragraphs:
-            if any(marker in para for marker in argument_markers) and len(current_segment) > 600:
-                if current_segment.strip():
-                    segments.append(current_segment.strip())
-                current_segment = para
+            if current_length > 600 and _ARGUMENT_MARKER_PATTERN.search(para):
+                current_segment = '\n\n'.join(current_parts).strip()
+                if current_segment:
+                    segments.append(current_segment)
+                current_parts = [para]
+                current_length = len(para)
+            elif current_length:
+                current_parts.append(para)
+                current_length += 2 + len(para)
             else:
-                current_segment += "\n\n" + para if current_segment else para
+                current_parts = [para]
+                current_length = len(para)
                 
-            if len(current_segment) > 1500:  # 控制段落长度
-                segments.append(current_segment.strip())
-                current_segment = ""
+            if current_length > 1500:  # 控制段落长度
+                segments.append('\n\n'.join(current_parts).strip())
+                current_parts = []
+                current_length = 0
         
-        if current_segment.strip():
-            segments.append(current_segment.strip())
+        current_segment = '\n\n'.join(current_parts).strip()
+        if current_segment:
+            segments.append(current_segment)
             
     else:  # descriptive 说明类
         # 说明类：按说明对象的不同维度分段
-        dimension_markers = ['外观', '功能', '特点', '优势', '方法', '步骤', '原理', '结构', '用途', '效果']
-        
         paragraphs = text.split('\n\n')
-        current_segment = ""
+        current_parts = []
+        current_length = 0  # 等于 len('\n\n'.join(current_parts))
         
         for para in paragraphs:
-            if any(marker in para for marker in dimension_markers) and len(current_segment) > 600:
-                if current_segment.strip():
-                    segments.append(current_segment.strip())
-                current_segment = para
+            if current_length > 600 and _DIMENSION_MARKER_PATTERN.search(para):
+                current_segment = '\n\n'.join(current_parts).strip()
+                if current_segment:
+                    segments.append(current_segment)
+                current_parts = [para]
+                current_length = len(para)
+            elif current_length:
+                current_parts.append(para)
+                current_length += 2 + len(para)
             else:
-                current_segment += "\n\n" + para if current_segment else para
+                current_parts = [para]
+                current_length = len(para)
                 
-            if len(current_segment) > 1200:  # 控制段落长度
-                segments.append(current_segment.strip())
-                current_segment = ""
+            if current_length > 1200:  # 控制段落长度
+                segments.append('\n\n'.join(current_parts).strip())
+                current_parts = []
+                current_length = 0
         
-        if current_segment.strip():
-            segments.append(current_segment.strip())
+        current_segment = '\n\n'.join(current_parts).strip()
+        if current_segment:
+            segments.append(current_segment)
     
     # 如果分段结果太少或太多，使用备选方案
     if len(segments) < 2 or len(segments) > 8:
@@ -1237,39 +1557,8 @@ def _smart_segment_text(text: str, text_type: str) -> List[str]:
     
     return segments[:6]  # 最多6段
 
-async def analyze_text_with_doubao(text: str, style_prompt: str) -> List[TextSegment]:
-    """
-    使用字节火山方舟 doubao 1.6 Thinking 智能分析文本
-    """
-    # 1. 检测文本类型
-    text_type = _detect_text_type(text)
-    print(f"检测到文本类型: {text_type}")
-    
-    # 2. 智能分段
-    raw_segments = _smart_segment_text(text, text_type)
-    print(f"智能分段完成，共{len(raw_segments)}段")
-    
-    if not client:
-        # 如果API未配置，使用本地增强的分段逻辑
-        segments = []
-        for i, segment_text in enumerate(raw_segments):
-            # 生成更好的摘要
-            summary = _generate_local_summary(segment_text, i + 1, text_type)
-            # 生成小红书风格的图片提示词
-            image_prompt = _generate_xiaohongshu_prompt(segment_text, style_prompt, text_type)
-            
-            segments.append(TextSegment(
-                id=i + 1,
-                content=segment_text,
-                summary=summary,
-                image_prompt=image_prompt
-            ))
-        return segments
-    
-    try:
-        # 3. 构建增强的分析提示词
-        analysis_prompt = f"""
-你是小红书内容创作专家，请将以下{text_type}类型的长文本进行智能分析和视觉化处理。
+# 文本分析的系统提示词：固定内容放在消息最前面，便于服务端前缀缓存命中
+_DOUBAO_SYSTEM_PROMPT = """你是小红书内容创作专家，请将用户提供的已分段长文本进行智能分析和视觉化处理。
 
 文本类型说明：
 - narrative（叙事类）：关注故事发展、场景转换、人物情感
@@ -1300,75 +1589,261 @@ async def analyze_text_with_doubao(text: str, style_prompt: str) -> List[TextSeg
    - summary: 内容主题摘要（20字以内）
    - image_prompt: 小红书风格图片描述（按上述结构生成）
 
-指定风格融合：{style_prompt}
-文本类型：{text_type}
+请返回JSON数组格式的分析结果，确保每个image_prompt都能让人清晰想象出具体的小红书风格画面。"""
 
-待分析的分段内容：
-"""
-        
-        # 添加分段内容
-        for i, segment in enumerate(raw_segments):
-            analysis_prompt += f"\n\n【第{i+1}段】\n{segment}"
-        
-        analysis_prompt += "\n\n请返回JSON数组格式的分析结果，确保每个image_prompt都能让人清晰想象出具体的小红书风格画面。"
-        
-        # 调用doubao 1.6 Thinking API
-        completion = client.chat.completions.create(
-            model="doubao-seed-1.6-thinking",
-            messages=[
-                {"role": "user", "content": analysis_prompt}
-            ],
-            max_tokens=6000,
-            temperature=0.6  # 降低随机性，提高一致性
-        )
+# 模型响应中的Markdown代码块（```json ... ```）
+_JSON_FENCE_PATTERN = re.compile(r'```(?:json)?\s*(.*?)```', re.S)
+_JSON_RAW_DECODER = json.JSONDecoder()
+
+def _extract_json_array(response_content: str) -> list:
+    """
+    从模型响应中提取第一个完整的JSON数组
+    先去掉代码块外壳并直接解析，失败时从每个'['起逐个尝试解码，允许数组前后夹带说明文字
+    """
+    fence_match = _JSON_FENCE_PATTERN.search(response_content)
+    content = fence_match.group(1) if fence_match else response_content
+    
+    try:
+        data = orjson.loads(content)
+        if isinstance(data, list):
+            return data
+    except orjson.JSONDecodeError:
+        pass
+    
+    start = content.find('[')
+    while start != -1:
+        try:
+            data, _ = _JSON_RAW_DECODER.raw_decode(content, start)
+            if isinstance(data, list):
+                return data
+        except ValueError:
+            pass
+        start = content.find('[', start + 1)
+    
+    raise ValueError("响应中未找到有效的JSON数组")
+
+async def _stream_doubao_response(chat_request: dict, expected_segments: int) -> str:
+    """
+    流式读取模型响应：数组闭合且段落数足够时立即停止，不再等待后续的说明文字
+    """
+    chunks = []
+    async with aclosing(_iter_doubao_content(chat_request)) as deltas:
+        async for delta in deltas:
+            chunks.append(delta)
+            # 只有出现']'时数组才可能闭合，此时再尝试解析
+            if ']' in delta:
+                try:
+                    if len(_extract_json_array("".join(chunks))) >= expected_segments:
+                        break
+                except ValueError:
+                    pass
+    return "".join(chunks)
+
+async def _iter_doubao_content(chat_request: dict):
+    """以流式方式调用模型，逐个产出非空的文本增量；提前退出时关闭连接"""
+    stream = await client.chat.completions.create(**chat_request, stream=True)
+    try:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        await stream.close()
+
+class JsonArrayStreamParser:
+    """增量解析流式到达的JSON数组：每次喂入新文本后，返回其中新近完整到达的数组元素"""
+    
+    def __init__(self):
+        self.buffer = ""
+        self.position = None  # 下一个元素在buffer中的起始位置，找到'['之前为None
+    
+    def feed(self, delta: str) -> list:
+        self.buffer += delta
+        items = []
+        if self.position is None:
+            start = self.buffer.find('[')
+            if start == -1:
+                return items
+            self.position = start + 1
         
-        response_content = completion.choices[0].message.content
-        print(f"Doubao API响应长度: {len(response_content)}")
+        buffer_length = len(self.buffer)
+        while True:
+            # 跳过元素之间的空白和逗号
+            while self.position < buffer_length and self.buffer[self.position] in ' \t\r\n,':
+                self.position += 1
+            if self.position >= buffer_length or self.buffer[self.position] == ']':
+                return items
+            try:
+                item, self.position = _JSON_RAW_DECODER.raw_decode(self.buffer, self.position)
+            except ValueError:
+                return items  # 当前元素尚未完整到达
+            items.append(item)
+
+def _llm_cache_key(chat_request: dict) -> str:
+    """按(模型, 消息, 参数)计算文本分析结果的缓存键"""
+    return "llm:" + hashlib.sha256(orjson.dumps(chat_request, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+async def _get_cached_llm_response(cache_key: str) -> Optional[str]:
+    """读取已缓存的模型响应，未启用Redis或未命中时返回None"""
+    if redis_client:
+        try:
+            cached_response = await redis_client.get(cache_key)
+            if cached_response:
+                return cached_response.decode('utf-8')
+        except Exception as e:
+            logger.warning("读取文本分析缓存失败: %s", e)
+    return None
+
+async def _set_cached_llm_response(cache_key: str, response_content: str):
+    """缓存可成功解析的模型响应"""
+    if redis_client:
+        try:
+            await redis_client.setex(cache_key, LLM_CACHE_TTL, response_content)
+        except Exception as e:
+            logger.warning("写入文本分析缓存失败: %s", e)
+
+async def analyze_text_with_doubao(text: str, style_prompt: str) -> List[TextSegment]:
+    """
+    使用字节火山方舟 doubao 1.6 Thinking 智能分析文本
+    """
+    # 1. 检测文本类型
+    text_type = _detect_text_type(text)
+    logger.debug("检测到文本类型: %s", text_type)
+    
+    # 2. 智能分段
+    raw_segments = _smart_segment_text(text, text_type)
+    logger.debug("智能分段完成，共%d段", len(raw_segments))
+    
+    if not client:
+        # 如果API未配置，使用本地增强的分段逻辑（与API路径一致，放到线程中执行）
+        return await asyncio.to_thread(_build_local_segments, raw_segments, style_prompt, text_type)
+    
+    # 本地分段结果与API调用并行计算：API失败时直接作为备选，成功时作为缺失字段的默认值
+    local_task = asyncio.ensure_future(asyncio.to_thread(_build_local_segments, raw_segments, style_prompt, text_type))
+    
+    try:
+        # 3. 调用doubao 1.6 Thinking API（相同请求优先复用缓存的响应）
+        chat_request = _build_doubao_request(raw_segments, style_prompt, text_type)
+        cache_key = _llm_cache_key(chat_request)
+        response_content = await _get_cached_llm_response(cache_key)
+        response_cached = response_content is not None
+        if not response_cached:
+            response_content = await _stream_doubao_response(chat_request, len(raw_segments))
+        logger.debug("Doubao API响应长度: %d", len(response_content))
         
         # 尝试解析JSON响应
         try:
-            # 提取JSON部分（可能包含在代码块中）
-            if "```json" in response_content:
-                json_start = response_content.find("```json") + 7
-                json_end = response_content.find("```", json_start)
-                json_content = response_content[json_start:json_end].strip()
-            elif "[" in response_content and "]" in response_content:
-                json_start = response_content.find("[")
-                json_end = response_content.rfind("]") + 1
-                json_content = response_content[json_start:json_end]
-            else:
-                json_content = response_content
-            
-            segments_data = json.loads(json_content)
-            print(f"成功解析JSON，包含{len(segments_data)}个段落")
+            # 提取JSON数组（可能包含在代码块中或夹带说明文字）
+            segments_data = _extract_json_array(response_content)
+            logger.debug("成功解析JSON，包含%d个段落", len(segments_data))
+            if not response_cached:
+                await _set_cached_llm_response(cache_key, response_content)
             
             # 转换为TextSegment对象
-            segments = []
-            for i, segment_data in enumerate(segments_data):
-                # 确保使用原始分段内容
-                original_content = raw_segments[i] if i < len(raw_segments) else segment_data.get("content", f"段落 {i + 1}")
-                
-                segments.append(TextSegment(
-                    id=segment_data.get("id", i + 1),
-                    content=original_content,
-                    summary=segment_data.get("summary", f"第{i + 1}段内容摘要"),
-                    image_prompt=segment_data.get("image_prompt", _generate_xiaohongshu_prompt(original_content, style_prompt, text_type))
-                ))
+            local_segments = await local_task
+            return [
+                _segment_from_analysis(i, segment_data, raw_segments, style_prompt, text_type, local_segments)
+                for i, segment_data in enumerate(segments_data)
+            ]
             
-            return segments
-            
-        except json.JSONDecodeError as e:
-            print(f"JSON解析失败: {str(e)}")
-            print(f"响应内容: {response_content[:500]}...")
+        except ValueError as e:
+            logger.warning("JSON解析失败: %s；响应内容: %s...", e, response_content[:500])
             
     except Exception as e:
-        print(f"调用doubao API失败: {str(e)}")
+        logger.warning("调用doubao API失败: %s", e)
+    
+    # 备选方案：使用本地增强逻辑（已与API调用并行算好）
+    logger.info("使用本地增强分段逻辑")
+    return await local_task
+
+def _build_doubao_request(raw_segments: List[str], style_prompt: str, text_type: str) -> dict:
+    """构建分析请求：固定说明在系统提示词中，这里只拼接本次请求的变量部分"""
+    analysis_prompt = f"指定风格融合：{style_prompt}\n文本类型：{text_type}\n\n待分析的分段内容：" + "".join(
+        f"\n\n【第{i+1}段】\n{segment}" for i, segment in enumerate(raw_segments)
+    )
+    return {
+        "model": "doubao-seed-1.6-thinking",
+        "messages": [
+            {"role": "system", "content": _DOUBAO_SYSTEM_PROMPT},
+            {"role": "user", "content": analysis_prompt}
+        ],
+        "max_tokens": 6000,
+        "temperature": 0.6  # 降低随机性，提高一致性
+    }
+
+def _segment_from_analysis(i: int, segment_data: dict, raw_segments: List[str], style_prompt: str,
+                           text_type: str, local_segments: Optional[List[TextSegment]] = None) -> TextSegment:
+    """
+    把模型返回的第i个段落对象转换为TextSegment，缺失的提示词用本地逻辑补齐
+    """
+    # 确保使用原始分段内容
+    original_content = raw_segments[i] if i < len(raw_segments) else segment_data.get("content", f"段落 {i + 1}")
+    
+    image_prompt = segment_data.get("image_prompt")
+    if image_prompt is None:
+        image_prompt = (local_segments[i].image_prompt if local_segments and i < len(local_segments)
+                        else _generate_xiaohongshu_prompt(original_content, style_prompt, text_type))
+    
+    return TextSegment(
+        id=segment_data.get("id", i + 1),
+        content=original_content,
+        summary=segment_data.get("summary", f"第{i + 1}段内容摘要"),
+        image_prompt=image_prompt
+    )
+
+async def iter_text_segments(text: str, style_prompt: str):
+    """
+    逐段产出分析结果，供分析与生图流水线使用：
+    调用Doubao时按流式响应中每个完整到达的段落对象产出；API不可用或中途失败时，其余段落用本地逻辑补齐
+    """
+    text_type = _detect_text_type(text)
+    raw_segments = _smart_segment_text(text, text_type)
+    produced = 0
+    
+    if client:
+        try:
+            chat_request = _build_doubao_request(raw_segments, style_prompt, text_type)
+            cache_key = _llm_cache_key(chat_request)
+            cached_response = await _get_cached_llm_response(cache_key)
+            if cached_response is not None:
+                for segment_data in _extract_json_array(cached_response):
+                    yield _segment_from_analysis(produced, segment_data, raw_segments, style_prompt, text_type)
+                    produced += 1
+            else:
+                parser = JsonArrayStreamParser()
+                segments_data = []
+                async with aclosing(_iter_doubao_content(chat_request)) as deltas:
+                    async for delta in deltas:
+                        for segment_data in parser.feed(delta):
+                            segments_data.append(segment_data)
+                            yield _segment_from_analysis(produced, segment_data, raw_segments, style_prompt, text_type)
+                            produced += 1
+                        if produced >= len(raw_segments):
+                            break
+                # 只有完整解析出全部段落时才缓存（保存为规整的JSON数组）
+                if produced >= len(raw_segments):
+                    await _set_cached_llm_response(cache_key, orjson.dumps(segments_data).decode('utf-8'))
+        except Exception as e:
+            logger.warning("流式调用doubao API失败: %s", e)
+    
+    # 其余段落使用本地增强逻辑（在线程中批量生成，不阻塞事件循环）
+    if produced < len(raw_segments):
+        for segment in await asyncio.to_thread(_build_local_segments, raw_segments, style_prompt, text_type, produced):
+            yield segment
+
+def _build_local_segments(raw_segments: List[str], style_prompt: str, text_type: str,
+                          start: int = 0) -> List[TextSegment]:
+    """
+    本地增强分段逻辑：为每段生成摘要和小红书风格的图片提示词（纯CPU计算，由调用方放到线程中执行）
+    start: 只生成从该下标开始的段落（流水线中API已产出前面的段落）
+    """
+    # 批量生成各段摘要（摘要依赖全文各段，仍按全部段落计算）
+    summaries = _generate_local_summaries(raw_segments, text_type)
     
-    # 备选方案：使用本地增强逻辑
-    print("使用本地增强分段逻辑")
     segments = []
-    for i, segment_text in enumerate(raw_segments):
-        summary = _generate_local_summary(segment_text, i + 1, text_type)
+    for i, (segment_text, summary) in enumerate(zip(raw_segments, summaries)):
+        if i < start:
+            continue
+        # 生成小红书风格的图片提示词
         image_prompt = _generate_xiaohongshu_prompt(segment_text, style_prompt, text_type)
         
         segments.append(TextSegment(
@@ -1377,38 +1852,44 @@ async def analyze_text_with_doubao(text: str, style_prompt: str) -> List[TextSeg
             summary=summary,
             image_prompt=image_prompt
         ))
-    
     return segments
 
-def _generate_local_summary(text: str, segment_id: int, text_type: str) -> str:
+# 本地摘要关键词（按文本类型）
+_SUMMARY_KEYWORDS = {
+    'narrative': ('故事', '情节', '人物', '场景', '情感', '经历', '遇到', '发生'),
+    'argumentative': ('观点', '论证', '分析', '认为', '因为', '所以', '结论'),
+    'descriptive': ('介绍', '说明', '特点', '功能', '方法', '原理', '结构')
+}
+_SUMMARY_SCANNERS = {text_type: _KeywordScanner(keywords) for text_type, keywords in _SUMMARY_KEYWORDS.items()}
+
+def _generate_local_summaries(raw_segments: List[str], text_type: str) -> List[str]:
     """
-    生成本地摘要
+    批量生成本地摘要：关键词表和匹配器按类型只选一次，每段单次扫描
     """
-    # 提取关键词
-    key_phrases = []
-    if text_type == 'narrative':
-        narrative_keywords = ['故事', '情节', '人物', '场景', '情感', '经历', '遇到', '发生']
-        key_phrases = [kw for kw in narrative_keywords if kw in text]
-    elif text_type == 'argumentative':
-        argument_keywords = ['观点', '论证', '分析', '认为', '因为', '所以', '结论']
-        key_phrases = [kw for kw in argument_keywords if kw in text]
-    else:
-        descriptive_keywords = ['介绍', '说明', '特点', '功能', '方法', '原理', '结构']
-        key_phrases = [kw for kw in descriptive_keywords if kw in text]
-    
-    # 生成摘要
-    if key_phrases:
-        return f"第{segment_id}段：{key_phrases[0]}相关内容"
-    else:
-        return f"第{segment_id}段内容摘要"
+    keywords = _SUMMARY_KEYWORDS.get(text_type, _SUMMARY_KEYWORDS['descriptive'])
+    scanner = _SUMMARY_SCANNERS.get(text_type, _SUMMARY_SCANNERS['descriptive'])
+    
+    summaries = []
+    for segment_id, text in enumerate(raw_segments, 1):
+        # 按类型关键词顺序取第一个命中项
+        found = scanner.find_positions(text)
+        key_phrase = next((kw for kw in keywords if kw in found), None)
+        
+        if key_phrase:
+            summaries.append(f"第{segment_id}段：{key_phrase}相关内容")
+        else:
+            summaries.append(f"第{segment_id}段内容摘要")
+    return summaries
 
+@functools.lru_cache(maxsize=1024)
 def _generate_xiaohongshu_prompt(text: str, style_prompt: str, text_type: str) -> str:
     """
     生成小红书风格的图片提示词 - 按照标准格式
     【风格定位】+【核心内容】+【视觉元素】+【排版要求】+【细节补充】
     专为长文转图片工具设计，适合小红书平台发布
+    结果只由入参决定，相同(文本, 风格, 类型)直接复用缓存
     """
-    print(f"正在为文本生成提示词: {text[:50]}...")
+    logger.debug("正在为文本生成提示词: %s...", text[:50])
     
     # 提取文章核心信息
     core_info = _extract_article_core_info(text)
@@ -1429,44 +1910,23 @@ def _generate_xiaohongshu_prompt(text: str, style_prompt: str, text_type: str) -
     # 【细节补充】- 技术参数和质量要求
     detail_supplements = _build_detail_supplements(core_info, text_type)
     
-    # 确保每个部分都有内容，避免空值
-    if not style_positioning.strip():
-        style_positioning = "清新自然风格"
-    if not core_content.strip():
-        core_content = "温馨故事场景"
-    if not visual_desc.strip():
-        visual_desc = "柔和光线，温暖色调"
-    
-    # 按格式组合提示词，使用分号分隔确保格式清晰
-    prompt_sections = [
-        f"【风格定位】{style_positioning.strip()}",
-        f"【核心内容】{core_content.strip()}",
-        f"【视觉元素】{visual_desc.strip()}",
-        f"【排版要求】{layout_requirements.strip()}",
-        f"【细节补充】{detail_supplements.strip()}"
-    ]
-    
-    full_prompt = "；".join(prompt_sections)
-    
-    # 长度控制（保持在300字以内，确保生成效果）
-    if len(full_prompt) > 300:
-        # 智能压缩各部分内容，保持核心信息
-        style_positioning = _truncate_text(style_positioning, 15)
-        core_content = _truncate_text(core_content, 50)
-        visual_desc = _truncate_text(visual_desc, 60)
-        layout_requirements = _truncate_text(layout_requirements, 30)
-        detail_supplements = _truncate_text(detail_supplements, 25)
-        
-        prompt_sections = [
-            f"【风格定位】{style_positioning}",
-            f"【核心内容】{core_content}",
-            f"【视觉元素】{visual_desc}",
-            f"【排版要求】{layout_requirements}",
-            f"【细节补充】{detail_supplements}"
-        ]
-        full_prompt = "；".join(prompt_sections)
-    
-    print(f"生成的图片提示词: {full_prompt}")
+    # 各部分（标题, 内容, 超长时的压缩长度），构建函数返回的内容已去除首尾空白，空值时使用默认内容
+    prompt_sections = (
+        ("【风格定位】", style_positioning or "清新自然风格", 15),
+        ("【核心内容】", core_content or "温馨故事场景", 50),
+        ("【视觉元素】", visual_desc or "柔和光线，温暖色调", 60),
+        ("【排版要求】", layout_requirements, 30),
+        ("【细节补充】", detail_supplements, 25)
+    )
+    
+    # 长度控制（保持在300字以内，确保生成效果）：先计算总长度，超长时才压缩各部分内容，保持核心信息
+    total_length = sum(len(title) + len(content) for title, content, _ in prompt_sections) + len(prompt_sections) - 1
+    if total_length > 300:
+        full_prompt = "；".join(f"{title}{_truncate_text(content, limit)}" for title, content, limit in prompt_sections)
+    else:
+        full_prompt = "；".join(f"{title}{content}" for title, content, _ in prompt_sections)
+    
+    logger.debug("生成的图片提示词: %s", full_prompt)
     return full_prompt
 
 def _truncate_text(text: str, max_length: int) -> str:
@@ -1474,111 +1934,144 @@ def _truncate_text(text: str, max_length: int) -> str:
     if len(text) <= max_length:
         return text
     
-    # 在逗号或句号处截断
-    for i in range(max_length - 1, max_length // 2, -1):
-        if text[i] in '，。、':
-            return text[:i]
+    # 在后半段最靠后的逗号、句号或顿号处截断
+    start = max_length // 2 + 1
+    cut = max(text.rfind('，', start, max_length), text.rfind('。', start, max_length), text.rfind('、', start, max_length))
+    if cut != -1:
+        return text[:cut]
     
     # 如果没有合适的截断点，直接截断
     return text[:max_length]
 
-def _extract_article_core_info(text: str) -> dict:
+# 核心信息提取词库（合并为一个扫描器，一次遍历得到全部命中）
+_CORE_EMOTION_WORDS = ('快乐', '愉悦', '温暖', '舒适', '宁静', '激动', '感动', '美好', '幸福', '满足')
+_CORE_ATMOSPHERE_WORDS = ('温馨', '清新', '自然', '现代', '时尚', '简约', '优雅', '活力', '宁静', '明亮', '柔和')
+# 未出现氛围词时，根据内容推断氛围：(判定词, 氛围)
+_CORE_ATMOSPHERE_FALLBACKS = (
+    (('学习', '工作', '办公'), '简约'),
+    (('自然', '户外', '风景'), '清新'),
+    (('家', '温暖', '舒适'), '温馨')
+)
+_CORE_VISUAL_OBJECTS = ('书', '咖啡', '花', '植物', '电脑', '手机', '笔记本', '杯子', '窗户', '桌子', '椅子', '灯', '相机')
+_CORE_SCENE_KEYWORDS = ('室内', '户外', '办公室', '咖啡厅', '家里', '公园', '街道', '教室', '图书馆')
+_CORE_INFO_SCANNER = _KeywordScanner(
+    _CORE_EMOTION_WORDS + _CORE_ATMOSPHERE_WORDS
+    + tuple(word for words, _ in _CORE_ATMOSPHERE_FALLBACKS for word in words)
+    + _CORE_VISUAL_OBJECTS + _CORE_SCENE_KEYWORDS
+)
+
+# 文章分析用正则（模块加载时编译一次）
+_SENTENCE_DELIMITER_PATTERN = re.compile(r'[。！？]')
+_CJK_WORD_PATTERN = re.compile(r'[一-龯]{2,6}')
+# 关键场景判定：包含感官、感受或视觉元素用字之一（原三条 .*[...].* 规则合并为一个字符类）
+_KEY_SCENE_CHAR_PATTERN = re.compile(r'[看到听感受美丽漂亮温暖舒适阳光线色彩颜]')
+# 描述性句子判定用字
+_DESCRIPTIVE_CHAR_PATTERN = re.compile(r'[的在像如美光色温柔]')
+
+@dataclass(slots=True)
+class CoreElements:
+    """文章核心元素"""
+    characters: List[str] = field(default_factory=list)  # 人物
+    objects: List[str] = field(default_factory=list)     # 物品
+    locations: List[str] = field(default_factory=list)   # 地点
+    emotions: List[str] = field(default_factory=list)    # 情感
+    actions: List[str] = field(default_factory=list)     # 动作
+    time: str = ''        # 时间
+    atmosphere: str = ''  # 氛围
+
+@dataclass(slots=True)
+class CoreInfo:
+    """文章核心信息"""
+    main_theme: str = ''
+    key_scenes: List[str] = field(default_factory=list)
+    core_elements: CoreElements = field(default_factory=CoreElements)
+    content_focus: str = ''  # 内容重点
+    specific_details: List[str] = field(default_factory=list)  # 具体细节描述
+    visual_elements: List[str] = field(default_factory=list)   # 可视化元素
+    sentences: List[str] = field(default_factory=list)         # 分句结果（去空白、长度>5），供各构建函数复用，避免重复分句
+
+def _extract_article_core_info(text: str) -> CoreInfo:
     """
     深度提取文章核心信息：专为小红书图片生成优化
     """
-    import re
-    
-    core_info = {
-        'main_theme': '',
-        'key_scenes': [],
-        'core_elements': {
-            'characters': [],  # 人物
-            'objects': [],     # 物品
-            'locations': [],   # 地点
-            'emotions': [],    # 情感
-            'actions': [],     # 动作
-            'time': '',        # 时间
-            'atmosphere': ''   # 氛围
-        },
-        'content_focus': '',  # 内容重点
-        'specific_details': [],  # 具体细节描述
-        'visual_elements': []    # 可视化元素
-    }
+    # 空白文本没有可提取的内容，直接返回默认氛围，跳过分句和关键词扫描
+    if not text or text.isspace():
+        return CoreInfo(core_elements=CoreElements(atmosphere='自然'))
     
     # 第一步：提取文章中的具体描述性句子
-    sentences = [s.strip() for s in re.split(r'[。！？]', text) if len(s.strip()) > 5]
+    sentences = [s for s in map(str.strip, _SENTENCE_DELIMITER_PATTERN.split(text)) if len(s) > 5]
+    core_info = CoreInfo(sentences=sentences)
+    core_elements = core_info.core_elements
     
     # 第二步：智能提取主题和重点内容
     # 提取文章开头的主要内容作为主题
     if sentences:
         first_sentence = sentences[0]
         # 提取主题关键词
-        theme_keywords = re.findall(r'[一-龯]{2,6}', first_sentence)
-        if theme_keywords:
-            core_info['main_theme'] = theme_keywords[0]
+        theme_match = _CJK_WORD_PATTERN.search(first_sentence)
+        if theme_match:
+            core_info.main_theme = theme_match.group()
         
         # 提取内容重点（通常在前几句中）
         content_parts = []
         for sentence in sentences[:3]:
             if len(sentence) >= 10:
                 content_parts.append(sentence[:25])  # 取前25个字符作为重点
-        core_info['content_focus'] = "，".join(content_parts[:2])
+        core_info.content_focus = "，".join(content_parts[:2])
     
-    # 第三步：提取情感和氛围词汇
-    emotion_words = ['快乐', '愉悦', '温暖', '舒适', '宁静', '激动', '感动', '美好', '幸福', '满足']
-    atmosphere_words = ['温馨', '清新', '自然', '现代', '时尚', '简约', '优雅', '活力', '宁静', '明亮', '柔和']
+    # 单次扫描全文，后续各步骤只做集合查找
+    found = _CORE_INFO_SCANNER.find_positions(text)
     
-    text_lower = text
-    for word in emotion_words:
-        if word in text_lower:
-            core_info['core_elements']['emotions'].append(word)
+    # 第三步：提取情感和氛围词汇
+    core_elements.emotions = [word for word in _CORE_EMOTION_WORDS if word in found]
     
-    for word in atmosphere_words:
-        if word in text_lower:
-            core_info['core_elements']['atmosphere'] = word
+    for word in _CORE_ATMOSPHERE_WORDS:
+        if word in found:
+            core_elements.atmosphere = word
             break
     
     # 如果没有找到氛围词，根据内容推断
-    if not core_info['core_elements']['atmosphere']:
-        if any(word in text for word in ['学习', '工作', '办公']):
-            core_info['core_elements']['atmosphere'] = '简约'
-        elif any(word in text for word in ['自然', '户外', '风景']):
-            core_info['core_elements']['atmosphere'] = '清新'
-        elif any(word in text for word in ['家', '温暖', '舒适']):
-            core_info['core_elements']['atmosphere'] = '温馨'
-        else:
-            core_info['core_elements']['atmosphere'] = '自然'
+    if not core_elements.atmosphere:
+        core_elements.atmosphere = next(
+            (atmosphere for words, atmosphere in _CORE_ATMOSPHERE_FALLBACKS if any(word in found for word in words)),
+            '自然'
+        )
     
     # 第四步：提取具体的物品和场景元素
     # 常见的可视化物品
-    visual_objects = ['书', '咖啡', '花', '植物', '电脑', '手机', '笔记本', '杯子', '窗户', '桌子', '椅子', '灯', '相机']
-    for obj in visual_objects:
-        if obj in text:
-            core_info['core_elements']['objects'].append(obj)
+    core_elements.objects = [obj for obj in _CORE_VISUAL_OBJECTS if obj in found]
     
     # 场景关键词
-    scene_keywords = ['室内', '户外', '办公室', '咖啡厅', '家里', '公园', '街道', '教室', '图书馆']
-    for scene in scene_keywords:
-        if scene in text:
-            core_info['core_elements']['locations'].append(scene)
-    
-    # 第五步：提取关键场景描述
-    descriptive_patterns = [
-        r'.*[看到听到感受到].*',  # 感官描述
-        r'.*[美丽漂亮温暖舒适].*',  # 感受描述
-        r'.*[阳光光线色彩颜色].*',  # 视觉元素
-    ]
+    core_elements.locations = [scene for scene in _CORE_SCENE_KEYWORDS if scene in found]
     
+    # 第五步：提取关键场景描述（感官描述、感受描述、视觉元素）
     for sentence in sentences:
-        for pattern in descriptive_patterns:
-            if re.search(pattern, sentence) and len(sentence) <= 40:
-                core_info['key_scenes'].append(sentence)
-                break
-        if len(core_info['key_scenes']) >= 2:  # 最多保留2个关键场景
+        if len(sentence) <= 40 and _KEY_SCENE_CHAR_PATTERN.search(sentence):
+            core_info.key_scenes.append(sentence)
+        if len(core_info.key_scenes) >= 2:  # 最多保留2个关键场景
             break
     
     return core_info
 
+# 语义主题判定：(关键词正则, 主题, 氛围, 视觉元素)，按优先级排列
+_SEMANTIC_THEME_RULES = (
+    (_keyword_pattern(['森林', '树', '山', '海', '天空', '阳光', '月光', '花', '草', '风', '云']),
+     '自然风光', '宁静自然', ('自然光线', '清新色调', '广角视野')),
+    (_keyword_pattern(['城市', '街道', '建筑', '灯光', '车', '人群', '商店']),
+     '都市生活', '现代都市', ('城市灯光', '现代建筑', '人文气息')),
+    (_keyword_pattern(['人', '朋友', '家人', '微笑', '拥抱', '眼神', '心情', '感情']),
+     '人物情感', '温暖情感', ('温暖色调', '人物特写', '情感表达')),
+    (_keyword_pattern(['食物', '美食', '咖啡', '茶', '香味', '味道', '烹饪']),
+     '美食生活', '温馨美味', ('暖色调', '精致摆盘', '生活质感'))
+)
+
+_SEMANTIC_EMOTION_RULES = (
+    (_keyword_pattern(['温暖', '舒适', '安心', '治愈', '宁静']), '温暖治愈'),
+    (_keyword_pattern(['快乐', '开心', '兴奋', '活力', '阳光']), '活力阳光'),
+    (_keyword_pattern(['思考', '深沉', '哲学', '思辨', '内省']), '深沉思考'),
+    (_keyword_pattern(['浪漫', '唯美', '梦幻', '诗意', '美丽']), '浪漫唯美')
+)
+
 def _analyze_content_semantics(text: str) -> dict:
     """
     分析文章内容的语义特征，而不是简单的关键词匹配
@@ -1591,87 +2084,58 @@ def _analyze_content_semantics(text: str) -> dict:
     }
     
     # 基于内容长度和复杂度的主题判断
-    if any(word in text for word in ['森林', '树', '山', '海', '天空', '阳光', '月光', '花', '草', '风', '云']):
-        analysis['theme'] = '自然风光'
-        analysis['atmosphere'] = '宁静自然'
-        analysis['visual_elements'] = ['自然光线', '清新色调', '广角视野']
-    elif any(word in text for word in ['城市', '街道', '建筑', '灯光', '车', '人群', '商店']):
-        analysis['theme'] = '都市生活'
-        analysis['atmosphere'] = '现代都市'
-        analysis['visual_elements'] = ['城市灯光', '现代建筑', '人文气息']
-    elif any(word in text for word in ['人', '朋友', '家人', '微笑', '拥抱', '眼神', '心情', '感情']):
-        analysis['theme'] = '人物情感'
-        analysis['atmosphere'] = '温暖情感'
-        analysis['visual_elements'] = ['温暖色调', '人物特写', '情感表达']
-    elif any(word in text for word in ['食物', '美食', '咖啡', '茶', '香味', '味道', '烹饪']):
-        analysis['theme'] = '美食生活'
-        analysis['atmosphere'] = '温馨美味'
-        analysis['visual_elements'] = ['暖色调', '精致摆盘', '生活质感']
+    for pattern, theme, atmosphere, visual_elements in _SEMANTIC_THEME_RULES:
+        if pattern.search(text):
+            analysis['theme'] = theme
+            analysis['atmosphere'] = atmosphere
+            analysis['visual_elements'] = list(visual_elements)
+            break
     
     # 情感分析
-    if any(word in text for word in ['温暖', '舒适', '安心', '治愈', '宁静']):
-        analysis['emotions'].append('温暖治愈')
-    if any(word in text for word in ['快乐', '开心', '兴奋', '活力', '阳光']):
-        analysis['emotions'].append('活力阳光')
-    if any(word in text for word in ['思考', '深沉', '哲学', '思辨', '内省']):
-        analysis['emotions'].append('深沉思考')
-    if any(word in text for word in ['浪漫', '唯美', '梦幻', '诗意', '美丽']):
-        analysis['emotions'].append('浪漫唯美')
+    analysis['emotions'] = [emotion for pattern, emotion in _SEMANTIC_EMOTION_RULES if pattern.search(text)]
     
     return analysis
     
-def _build_visual_elements(core_info: dict, text_type: str) -> dict:
+def _build_visual_elements(core_info: CoreInfo, text_type: str) -> dict:
     """
     根据核心信息构建视觉元素描述 - 基于具体内容而非模板
     """
     visual = {
         'main_subject': '',
-        'scene_description': '',
-        'style_elements': '',
-        'technical_specs': ''
+        'scene_description': ''
     }
     
     # 使用具体的文章内容构建主体描述
-    if core_info['specific_details']:
+    if core_info.specific_details:
         # 从具体描述中提取主体
-        first_detail = core_info['specific_details'][0]
+        first_detail = core_info.specific_details[0]
         visual['main_subject'] = first_detail
-    elif core_info['content_focus']:
+    elif core_info.content_focus:
         # 使用内容重点作为主体
-        visual['main_subject'] = core_info['content_focus'][:20]
+        visual['main_subject'] = core_info.content_focus[:20]
     else:
         # 兜底方案
-        visual['main_subject'] = f"{core_info['main_theme']}场景"
+        visual['main_subject'] = f"{core_info.main_theme}场景"
     
     # 构建场景描述 - 结合具体内容和视觉元素
     scene_parts = []
     
     # 添加具体的视觉元素
-    if core_info['visual_elements']:
-        scene_parts.extend(core_info['visual_elements'][:2])
+    if core_info.visual_elements:
+        scene_parts.extend(core_info.visual_elements[:2])
     
     # 添加氛围描述
-    if core_info['core_elements']['atmosphere']:
-        scene_parts.append(f"{core_info['core_elements']['atmosphere']}氛围")
+    if core_info.core_elements.atmosphere:
+        scene_parts.append(f"{core_info.core_elements.atmosphere}氛围")
     
     # 添加情感色彩
-    if core_info['core_elements']['emotions']:
-        emotion = core_info['core_elements']['emotions'][0]
+    if core_info.core_elements.emotions:
+        emotion = core_info.core_elements.emotions[0]
         scene_parts.append(f"{emotion}感")
     
     visual['scene_description'] = "，".join(scene_parts) if scene_parts else "温馨生活场景"
     
-    # 构建风格元素
-    style_parts = []
-    if core_info['core_elements']['atmosphere']:
-        style_parts.append(core_info['core_elements']['atmosphere'])
-    if core_info['core_elements']['emotions']:
-        style_parts.append(core_info['core_elements']['emotions'][0])
-    visual['style_elements'] = "，".join(style_parts) if style_parts else "温馨自然"
-    
-    # 技术规格
-    visual['technical_specs'] = "高清摄影，专业构图，自然光线"
-    
+    # 风格、色彩与技术规格统一由 STYLE_TEMPLATES 提供，这里只构建主体和场景
     return visual
 
 # 全局风格模板系统
@@ -1717,70 +2181,88 @@ STYLE_TEMPLATES = {
         "mood": "青春活力，动感十足"
     }
 }
+# 模板只读，避免运行时修改导致与下方预拼接片段不一致
+STYLE_TEMPLATES = {name: types.MappingProxyType(template) for name, template in STYLE_TEMPLATES.items()}
+
+class Style(IntEnum):
+    """统一风格编号，与 STYLE_TEMPLATES 的定义顺序一致"""
+    WARM = 0    # 温馨治愈
+    FRESH = 1   # 清新自然
+    MODERN = 2  # 现代简约
+    RETRO = 3   # 文艺复古
+    YOUTH = 4   # 活力青春
+
+# 各风格在提示词中使用的固定片段，导入时拼接一次，按 Style 编号索引
+_STYLE_FRAGMENTS = tuple(
+    {
+        'positioning': f"{template['base_style']}，{template['mood']}",
+        'visual_parts': (template['color_palette'], template['lighting'], template['composition']),
+        'details': f"高清摄影，专业构图，{template['texture']}",
+    }
+    for template in STYLE_TEMPLATES.values()
+)
 
-def _determine_unified_style(core_info: dict, text_type: str, style_prompt: str) -> str:
+def _determine_unified_style(core_info: CoreInfo, text_type: str, style_prompt: str) -> Style:
     """
     确定统一的风格模板
     """
-    atmosphere = core_info['core_elements'].get('atmosphere', '')
-    emotions = core_info['core_elements'].get('emotions', [])
-    
+    core_elements = core_info.core_elements
+    return _unified_style_for(core_elements.atmosphere, tuple(core_elements.emotions), style_prompt)
+
+@functools.lru_cache(maxsize=256)
+def _unified_style_for(atmosphere: str, emotions: tuple, style_prompt: str) -> Style:
+    """
+    按(氛围, 情感, 用户风格)确定风格模板，组合有限，结果缓存复用
+    """
     # 优先使用用户指定的风格
     if style_prompt and style_prompt != "现代简约风格":
         if "温馨" in style_prompt or "治愈" in style_prompt:
-            return "温馨治愈"
+            return Style.WARM
         elif "清新" in style_prompt or "自然" in style_prompt:
-            return "清新自然"
+            return Style.FRESH
         elif "文艺" in style_prompt or "复古" in style_prompt:
-            return "文艺复古"
+            return Style.RETRO
         elif "活力" in style_prompt or "青春" in style_prompt:
-            return "活力青春"
+            return Style.YOUTH
         else:
-            return "现代简约"
+            return Style.MODERN
     
     # 基于内容自动判断风格
     if '温馨' in atmosphere or '温暖' in atmosphere:
-        return "温馨治愈"
+        return Style.WARM
     elif '清新' in atmosphere or '自然' in atmosphere:
-        return "清新自然"
+        return Style.FRESH
     elif emotions and ('快乐' in emotions or '愉悦' in emotions):
-        return "活力青春"
+        return Style.YOUTH
     elif '文艺' in atmosphere or '怀旧' in atmosphere:
-        return "文艺复古"
+        return Style.RETRO
     else:
-        return "现代简约"
+        return Style.MODERN
 
-def _build_style_positioning(core_info: dict, text_type: str, style_prompt: str) -> str:
+def _build_style_positioning(core_info: CoreInfo, text_type: str, style_prompt: str) -> str:
     """
     构建【风格定位】部分 - 确定整体视觉风格（统一风格）
     """
     # 确定统一风格模板
     unified_style = _determine_unified_style(core_info, text_type, style_prompt)
-    template = STYLE_TEMPLATES[unified_style]
     
-    # 构建风格描述
-    style_elements = [
-        template["base_style"],
-        template["mood"]
-    ]
-    
-    return "，".join(style_elements)
+    # 风格描述：基础风格 + 情绪氛围
+    return _STYLE_FRAGMENTS[unified_style]['positioning']
 
-def _build_core_content(core_info: dict, text: str) -> str:
+def _build_core_content(core_info: CoreInfo, text: str) -> str:
     """
     构建【核心内容】部分 - 提取文章主要内容和关键信息
     """
     content_parts = []
     
-    # 从原文中提取关键句子，避免重复
-    import re
-    sentences = [s.strip() for s in re.split(r'[。！？]', text) if 15 <= len(s.strip()) <= 40]
+    # 从原文中提取关键句子，避免重复（复用核心信息提取时的分句结果）
+    sentences = [s for s in core_info.sentences if 15 <= len(s) <= 40]
     
     if sentences:
         # 选择最有描述性的句子
         descriptive_sentence = None
         for sentence in sentences[:3]:  # 只检查前3句
-            if any(word in sentence for word in ['的', '在', '像', '如', '美', '光', '色', '温', '柔']):
+            if _DESCRIPTIVE_CHAR_PATTERN.search(sentence):
                 descriptive_sentence = sentence
                 break
         
@@ -1788,8 +2270,8 @@ def _build_core_content(core_info: dict, text: str) -> str:
             content_parts.append(descriptive_sentence)
     
     # 添加主要主题（如果与已有内容不重复）
-    if core_info.get('main_theme'):
-        theme = core_info['main_theme']
+    if core_info.main_theme:
+        theme = core_info.main_theme
         if not content_parts or theme not in content_parts[0]:
             content_parts.append(theme)
     
@@ -1799,13 +2281,12 @@ def _build_core_content(core_info: dict, text: str) -> str:
     
     return "，".join(content_parts[:2])  # 最多2个内容点
 
-def _build_visual_description(visual_elements: dict, core_info: dict) -> str:
+def _build_visual_description(visual_elements: dict, core_info: CoreInfo) -> str:
     """
     构建【视觉元素】部分 - 统一风格的视觉描述
     """
     # 获取统一风格模板
     unified_style = _determine_unified_style(core_info, "", "")
-    template = STYLE_TEMPLATES[unified_style]
     
     visual_parts = []
     
@@ -1821,16 +2302,8 @@ def _build_visual_description(visual_elements: dict, core_info: dict) -> str:
         if len(scene) <= 15:
             visual_parts.append(scene)
     
-    # 应用统一的色彩和光线
-    visual_parts.append(template["color_palette"])
-    visual_parts.append(template["lighting"])
-    
-    # 构图和质感
-    visual_parts.append(template["composition"])
-    
-    # 如果没有足够的视觉元素，添加默认值
-    if len(visual_parts) < 3:
-        visual_parts.extend([template["color_palette"], template["lighting"]])
+    # 应用统一的色彩、光线和构图（至少3个元素，无需再补默认值）
+    visual_parts.extend(_STYLE_FRAGMENTS[unified_style]['visual_parts'])
     
     return "，".join(visual_parts[:4])  # 限制最多4个元素
 
@@ -1840,32 +2313,23 @@ def _build_layout_requirements() -> str:
     """
     return "竖版构图9:16，小红书风格排版，清晰易读，视觉层次分明"
 
-def _build_detail_supplements(core_info: dict, text_type: str) -> str:
+def _build_detail_supplements(core_info: CoreInfo, text_type: str) -> str:
     """
     构建【细节补充】部分 - 统一风格的技术参数和质量要求
     """
     # 获取统一风格模板
     unified_style = _determine_unified_style(core_info, text_type, "")
-    template = STYLE_TEMPLATES[unified_style]
-    
-    details = []
-    
-    # 基础技术要求（统一）
-    details.append("高清摄影")
-    details.append("专业构图")
-    
-    # 应用风格特定的质感
-    details.append(template["texture"])
     
     # 根据文本类型添加特定要求
     if text_type == '叙事文':
-        details.append("情感表达")
+        requirement = "情感表达"
     elif text_type == '说明文':
-        details.append("简洁明了")
+        requirement = "简洁明了"
     else:
-        details.append("视觉美感")
+        requirement = "视觉美感"
     
-    return "，".join(details)
+    # 统一的基础技术要求 + 风格特定质感 + 类型要求
+    return f"{_STYLE_FRAGMENTS[unified_style]['details']}，{requirement}"
 
 def _get_xiaohongshu_style_keywords(theme: str) -> str:
     """
@@ -1884,12 +2348,53 @@ def _get_xiaohongshu_style_keywords(theme: str) -> str:
     
     return theme_styles.get(theme, f"{base_style}，高饱和度，温暖色调，生活美学")
 
+# 文本内容分析词库（合并为一个扫描器，一次遍历得到全部命中）
+_CONTENT_THEME_KEYWORDS = {
+    '自然风光': ('山', '海', '湖', '河', '森林', '树', '花', '草', '天空', '云', '阳光', '月亮', '星星', '雨', '雪', '风景', '自然', '户外'),
+    '都市生活': ('城市', '街道', '建筑', '高楼', '商店', '咖啡厅', '餐厅', '办公室', '地铁', '公交', '车', '马路', '灯光', '夜景'),
+    '人物情感': ('人', '女孩', '男孩', '朋友', '家人', '恋人', '孩子', '老人', '微笑', '拥抱', '眼神', '表情', '手势'),
+    '学习工作': ('学习', '工作', '书', '笔', '电脑', '手机', '办公', '会议', '思考', '写作', '阅读', '研究', '项目'),
+    '美食生活': ('食物', '美食', '咖啡', '茶', '蛋糕', '面包', '水果', '蔬菜', '料理', '烹饪', '餐具', '厨房', '味道'),
+    '旅行探索': ('旅行', '旅游', '探索', '冒险', '路', '地图', '背包', '相机', '景点', '文化', '体验', '发现'),
+    '艺术创作': ('艺术', '画', '音乐', '创作', '设计', '色彩', '线条', '构图', '灵感', '美感', '创意', '表达'),
+    '运动健康': ('运动', '健身', '跑步', '游泳', '瑜伽', '健康', '活力', '汗水', '坚持', '挑战', '目标', '成就')
+}
+
+_CONTENT_EMOTION_KEYWORDS = {
+    '温暖治愈': ('温暖', '治愈', '舒适', '安心', '放松', '宁静', '平和', '柔和', '温馨', '甜蜜'),
+    '活力阳光': ('活力', '阳光', '开心', '快乐', '兴奋', '充满', '生机', '活跃', '明亮', '积极'),
+    '深沉思考': ('思考', '深沉', '沉思', '理性', '智慧', '哲学', '内省', '冥想', '专注', '严肃'),
+    '浪漫唯美': ('浪漫', '唯美', '梦幻', '美丽', '优雅', '诗意', '柔美', '迷人', '动人', '醉人'),
+    '忧郁深邃': ('忧郁', '深邃', '孤独', '思念', '怀念', '伤感', '惆怅', '沉重', '复杂', '细腻')
+}
+
+_CONTENT_SETTING_KEYWORDS = {
+    '室内': ('房间', '家', '客厅', '卧室', '厨房', '书房', '办公室', '教室', '图书馆', '咖啡厅', '餐厅'),
+    '室外': ('公园', '街道', '广场', '海边', '山上', '森林', '花园', '阳台', '天台', '操场', '田野'),
+    '特殊场所': ('学校', '医院', '商场', '机场', '车站', '博物馆', '剧院', '体育馆', '工厂', '农场')
+}
+
+_CONTENT_TIME_KEYWORDS = {
+    '早晨': ('早晨', '清晨', '黎明', '日出', '晨光', '朝阳'),
+    '白天': ('白天', '中午', '下午', '阳光', '明亮', '日光'),
+    '傍晚': ('傍晚', '黄昏', '夕阳', '日落', '余晖', '暮色'),
+    '夜晚': ('夜晚', '深夜', '月光', '星光', '灯火', '夜色')
+}
+
+_CONTENT_COLOR_KEYWORDS = ('红', '橙', '黄', '绿', '蓝', '紫', '粉', '白', '黑', '灰', '金', '银', '彩色', '鲜艳', '柔和', '明亮', '暗淡')
+
+_CONTENT_SCANNER = _KeywordScanner(
+    [keyword for keywords in _CONTENT_THEME_KEYWORDS.values() for keyword in keywords]
+    + [keyword for keywords in _CONTENT_EMOTION_KEYWORDS.values() for keyword in keywords]
+    + [keyword for keywords in _CONTENT_SETTING_KEYWORDS.values() for keyword in keywords]
+    + [keyword for keywords in _CONTENT_TIME_KEYWORDS.values() for keyword in keywords]
+    + list(_CONTENT_COLOR_KEYWORDS)
+)
+
 def _analyze_text_content(text: str) -> dict:
     """
     智能分析文本内容，提取关键信息
     """
-    import re
-    
     analysis = {
         'main_theme': '',
         'key_objects': [],
@@ -1901,51 +2406,13 @@ def _analyze_text_content(text: str) -> dict:
         'specific_details': []
     }
     
-    # 扩展的关键词库
-    theme_keywords = {
-        '自然风光': ['山', '海', '湖', '河', '森林', '树', '花', '草', '天空', '云', '阳光', '月亮', '星星', '雨', '雪', '风景', '自然', '户外'],
-        '都市生活': ['城市', '街道', '建筑', '高楼', '商店', '咖啡厅', '餐厅', '办公室', '地铁', '公交', '车', '马路', '灯光', '夜景'],
-        '人物情感': ['人', '女孩', '男孩', '朋友', '家人', '恋人', '孩子', '老人', '微笑', '拥抱', '眼神', '表情', '手势'],
-        '学习工作': ['学习', '工作', '书', '笔', '电脑', '手机', '办公', '会议', '思考', '写作', '阅读', '研究', '项目'],
-        '美食生活': ['食物', '美食', '咖啡', '茶', '蛋糕', '面包', '水果', '蔬菜', '料理', '烹饪', '餐具', '厨房', '味道'],
-        '旅行探索': ['旅行', '旅游', '探索', '冒险', '路', '地图', '背包', '相机', '景点', '文化', '体验', '发现'],
-        '艺术创作': ['艺术', '画', '音乐', '创作', '设计', '色彩', '线条', '构图', '灵感', '美感', '创意', '表达'],
-        '运动健康': ['运动', '健身', '跑步', '游泳', '瑜伽', '健康', '活力', '汗水', '坚持', '挑战', '目标', '成就']
-    }
-    
-    # 情感词汇库
-    emotion_keywords = {
-        '温暖治愈': ['温暖', '治愈', '舒适', '安心', '放松', '宁静', '平和', '柔和', '温馨', '甜蜜'],
-        '活力阳光': ['活力', '阳光', '开心', '快乐', '兴奋', '充满', '生机', '活跃', '明亮', '积极'],
-        '深沉思考': ['思考', '深沉', '沉思', '理性', '智慧', '哲学', '内省', '冥想', '专注', '严肃'],
-        '浪漫唯美': ['浪漫', '唯美', '梦幻', '美丽', '优雅', '诗意', '柔美', '迷人', '动人', '醉人'],
-        '忧郁深邃': ['忧郁', '深邃', '孤独', '思念', '怀念', '伤感', '惆怅', '沉重', '复杂', '细腻']
-    }
-    
-    # 场景设定词汇
-    setting_keywords = {
-        '室内': ['房间', '家', '客厅', '卧室', '厨房', '书房', '办公室', '教室', '图书馆', '咖啡厅', '餐厅'],
-        '室外': ['公园', '街道', '广场', '海边', '山上', '森林', '花园', '阳台', '天台', '操场', '田野'],
-        '特殊场所': ['学校', '医院', '商场', '机场', '车站', '博物馆', '剧院', '体育馆', '工厂', '农场']
-    }
-    
-    # 时间语境
-    time_keywords = {
-        '早晨': ['早晨', '清晨', '黎明', '日出', '晨光', '朝阳'],
-        '白天': ['白天', '中午', '下午', '阳光', '明亮', '日光'],
-        '傍晚': ['傍晚', '黄昏', '夕阳', '日落', '余晖', '暮色'],
-        '夜晚': ['夜晚', '深夜', '月光', '星光', '灯火', '夜色']
-    }
-    
-    # 颜色词汇
-    color_keywords = ['红', '橙', '黄', '绿', '蓝', '紫', '粉', '白', '黑', '灰', '金', '银', '彩色', '鲜艳', '柔和', '明亮', '暗淡']
-    
-    text_lower = text.lower()
+    # 单次扫描全文，后续各步骤只做集合查找
+    found = _CONTENT_SCANNER.find_positions(text)
     
     # 分析主题
     theme_scores = {}
-    for theme, keywords in theme_keywords.items():
-        score = sum(1 for keyword in keywords if keyword in text)
+    for theme, keywords in _CONTENT_THEME_KEYWORDS.items():
+        score = sum(1 for keyword in keywords if keyword in found)
         if score > 0:
             theme_scores[theme] = score
     
@@ -1953,29 +2420,29 @@ def _analyze_text_content(text: str) -> dict:
         analysis['main_theme'] = max(theme_scores.items(), key=lambda x: x[1])[0]
     
     # 提取具体对象（更智能的方式）
-    for theme, keywords in theme_keywords.items():
+    for theme, keywords in _CONTENT_THEME_KEYWORDS.items():
         for keyword in keywords:
-            if keyword in text and keyword not in analysis['key_objects']:
+            if keyword in found and keyword not in analysis['key_objects']:
                 analysis['key_objects'].append(keyword)
     
     # 分析情感氛围
-    for emotion, keywords in emotion_keywords.items():
-        if any(keyword in text for keyword in keywords):
+    for emotion, keywords in _CONTENT_EMOTION_KEYWORDS.items():
+        if any(keyword in found for keyword in keywords):
             analysis['emotions'].append(emotion)
     
     # 分析场景设定
-    for setting, keywords in setting_keywords.items():
-        if any(keyword in text for keyword in keywords):
+    for setting, keywords in _CONTENT_SETTING_KEYWORDS.items():
+        if any(keyword in found for keyword in keywords):
             analysis['settings'].append(setting)
     
     # 分析时间语境
-    for time_period, keywords in time_keywords.items():
-        if any(keyword in text for keyword in keywords):
+    for time_period, keywords in _CONTENT_TIME_KEYWORDS.items():
+        if any(keyword in found for keyword in keywords):
             analysis['time_context'] = time_period
             break
     
     # 提取颜色信息
-    analysis['colors'] = [color for color in color_keywords if color in text]
+    analysis['colors'] = [color for color in _CONTENT_COLOR_KEYWORDS if color in found]
     
     # 提取具体细节（文本中的具体描述）
     sentences = text.split('。')
@@ -2126,124 +2593,323 @@ def _build_display_style(content_analysis: dict, visual_elements: dict) -> str:
     
     return "，".join(display_parts)
 
-async def generate_images_with_seedream(segments: List[TextSegment], style_prompt: str) -> List[GeneratedImage]:
+# 代理图片哈希 -> 服务商原始URL（进程内LRU；启用Redis时跨进程共享，否则在缓存目录落盘 {hash}.src 供其他worker读取）
+_proxied_image_sources: "OrderedDict[str, str]" = OrderedDict()
+# 代理图片哈希 -> 已落盘图片的媒体类型（进程内LRU）
+_proxied_image_types: "OrderedDict[str, str]" = OrderedDict()
+_IMAGE_HASH_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+def _read_proxied_source_file(image_hash: str) -> Optional[str]:
+    """读取落盘的代理映射，超过 IMAGE_CACHE_TTL 视为服务商URL已过期并删除（同步磁盘IO，由调用方放到线程中执行）"""
+    source_path = os.path.join(IMAGE_PROXY_CACHE_DIR, f"{image_hash}.src")
+    try:
+        if os.path.getmtime(source_path) + IMAGE_CACHE_TTL < time.time():
+            os.remove(source_path)
+            return None
+        with open(source_path, encoding='utf-8') as source_file:
+            return source_file.read()
+    except OSError:
+        return None
+
+def _sniff_image_media_type(path: str) -> str:
+    """按文件内容识别图片媒体类型（同步磁盘IO，由调用方放到线程中执行）"""
+    try:
+        with Image.open(path) as image:
+            return Image.MIME.get(image.format, "application/octet-stream")
+    except Exception:
+        return "application/octet-stream"
+
+async def register_proxied_image(image_url: str) -> str:
     """
-    使用SeeDream 4.0生成图片
+    登记服务商返回的图片URL，返回可长期缓存的代理地址
     """
-    images = []
-    
-    for segment in segments:
+    image_hash = hashlib.blake2b(image_url.encode('utf-8'), digest_size=16).hexdigest()
+    _lru_remember(_proxied_image_sources, image_hash, image_url, IMAGE_PROXY_MAP_SIZE)
+    if redis_client:
         try:
-            if client:
-                # 使用火山方舟SeeDream 4.0 API生成图片
-                combined_prompt = f"{style_prompt}, {segment.image_prompt}"
-                print(f"生成图片 - 段落{segment.id}: {combined_prompt}")
-                
-                response = client.images.generate(
+            await redis_client.setex(f"imgsrc:{image_hash}", IMAGE_CACHE_TTL, image_url)
+            return f"/api/img/{image_hash}"
+        except Exception as e:
+            logger.warning("写入图片代理映射失败: %s", e)
+    # 未启用Redis（或写入失败）时落盘，请求落到其他worker时也能找到原始URL
+    source_path = os.path.join(IMAGE_PROXY_CACHE_DIR, f"{image_hash}.src")
+    await asyncio.to_thread(_write_file_atomic, IMAGE_PROXY_CACHE_DIR, source_path, image_url.encode('utf-8'))
+    return f"/api/img/{image_hash}"
+
+async def _lookup_proxied_image(image_hash: str) -> Optional[str]:
+    """查找代理哈希对应的服务商原始URL：进程内LRU -> Redis -> 落盘映射"""
+    image_url = _proxied_image_sources.get(image_hash)
+    if image_url is not None:
+        _proxied_image_sources.move_to_end(image_hash)
+        return image_url
+    if redis_client:
+        try:
+            cached_url = await redis_client.get(f"imgsrc:{image_hash}")
+            if cached_url:
+                image_url = cached_url.decode('utf-8')
+        except Exception as e:
+            logger.warning("读取图片代理映射失败: %s", e)
+    if image_url is None:
+        image_url = await asyncio.to_thread(_read_proxied_source_file, image_hash)
+    if image_url is not None:
+        _lru_remember(_proxied_image_sources, image_hash, image_url, IMAGE_PROXY_MAP_SIZE)
+    return image_url
+
+# 批次生成状态（进程内；启用Redis时保存在 batch:{id} 哈希中，多个worker共享）
+_batch_states: Dict[str, dict] = {}
+
+async def _create_batch_state(batch_id: str, total_count: int):
+    """登记新批次：状态为generating，已完成数为0"""
+    state = {"status": "generating", "completed_count": 0, "total_count": total_count}
+    if redis_client:
+        try:
+            async with redis_client.pipeline(transaction=True) as pipe:
+                pipe.hset(f"batch:{batch_id}", mapping=state)
+                pipe.expire(f"batch:{batch_id}", BATCH_STATE_TTL)
+                await pipe.execute()
+            return
+        except Exception as e:
+            logger.warning("写入批次状态失败: %s", e)
+    # 未启用Redis（或写入失败）时保存在进程内，顺带清理已过期的批次
+    _purge_expired_batch_states()
+    _batch_states[batch_id] = {**state, "expires_at": time.monotonic() + BATCH_STATE_TTL}
+
+def _purge_expired_batch_states():
+    """清理进程内已过期的批次状态"""
+    now = time.monotonic()
+    for expired_id in [key for key, value in _batch_states.items() if value["expires_at"] <= now]:
+        del _batch_states[expired_id]
+
+async def _update_batch_state(batch_id: str, completed: int = 0, status: Optional[str] = None, added: int = 0):
+    """累加批次的已完成段落数或总段落数（流水线中段落逐个加入），或更新批次状态"""
+    local_state = _batch_states.get(batch_id)
+    if local_state is not None:
+        local_state["completed_count"] += completed
+        local_state["total_count"] += added
+        if status:
+            local_state["status"] = status
+        return
+    if redis_client:
+        try:
+            if completed:
+                await redis_client.hincrby(f"batch:{batch_id}", "completed_count", completed)
+            if added:
+                await redis_client.hincrby(f"batch:{batch_id}", "total_count", added)
+            if status:
+                await redis_client.hset(f"batch:{batch_id}", "status", status)
+        except Exception as e:
+            logger.warning("更新批次状态失败: %s", e)
+
+async def _load_batch_state(batch_id: str) -> Optional[dict]:
+    """读取批次状态，不存在或已过期时返回None"""
+    _purge_expired_batch_states()
+    local_state = _batch_states.get(batch_id)
+    if local_state is not None:
+        return local_state
+    if redis_client:
+        try:
+            fields = await redis_client.hgetall(f"batch:{batch_id}")
+            if fields:
+                return {
+                    "status": fields[b"status"].decode('utf-8'),
+                    "completed_count": int(fields[b"completed_count"]),
+                    "total_count": int(fields[b"total_count"])
+                }
+        except Exception as e:
+            logger.warning("读取批次状态失败: %s", e)
+    return None
+
+# 失败占位图的配色，按段落序号循环取色
+_PLACEHOLDER_COLORS = ("4f46e5", "7c3aed", "db2777", "dc2626", "ea580c", "d97706", "65a30d", "059669", "0891b2", "0284c7")
+
+def _placeholder_data_uri(segment: TextSegment) -> str:
+    """
+    在进程内生成纯色SVG占位图（data URI），失败分支不再发起网络请求或PIL绘制
+    """
+    color = _PLACEHOLDER_COLORS[(segment.id - 1) % len(_PLACEHOLDER_COLORS)]
+    text = _xml_escape(segment.content[:80])
+    svg = (
+        '<svg xmlns="http://www.w3.org/2000/svg" width="600" height="800" viewBox="0 0 600 800">'
+        f'<rect width="600" height="800" fill="#{color}"/>'
+        '<foreignObject x="40" y="40" width="520" height="720">'
+        '<div xmlns="http://www.w3.org/1999/xhtml" style="color:#fff;font-size:28px;line-height:1.6;word-break:break-all">'
+        f'{text}</div></foreignObject></svg>'
+    )
+    return "data:image/svg+xml;base64," + base64.b64encode(svg.encode('utf-8')).decode('ascii')
+
+def _segment_image_prompt(segment: TextSegment, style_prompt: str) -> str:
+    """演示模式的图片提示词：优先使用段落的image_prompt，为空时才用风格+正文开头拼接"""
+    return segment.image_prompt or f"{style_prompt}，{segment.content[:100]}..."
+
+async def _generate_segment_image(segment: TextSegment, style_prompt: str,
+                                  image_service: Optional[ImageGenerationService] = None,
+                                  composer: Optional[ImageComposer] = None) -> GeneratedImage:
+    """
+    为单个段落生成图片，失败时返回占位图片，不影响其他段落
+    image_service/composer: 由端点注入的服务单例，为空时使用模块级实例
+    """
+    image_service = image_service or image_generator
+    composer = composer or image_composer
+    try:
+        if client:
+            # 使用火山方舟SeeDream 4.0 API生成图片
+            combined_prompt = f"{style_prompt}, {segment.image_prompt}"
+            logger.debug("生成图片 - 段落%s: %s", segment.id, combined_prompt)
+            
+            async def generate_seedream_image() -> Optional[str]:
+                response = await _generate_volcano_images(
                     model=VOLCANO_IMAGE_MODEL,
                     prompt=combined_prompt,
                     size=VOLCANO_IMAGE_SIZE
                 )
                 
                 if hasattr(response, 'data') and response.data and len(response.data) > 0:
-                    image_url = response.data[0].url
-                    images.append(GeneratedImage(
-                        segment_id=segment.id,
-                        image_url=image_url,
-                        thumbnail_url=image_url,  # 可以后续添加缩略图生成逻辑
-                        status="completed"
-                    ))
+                    return await register_proxied_image(response.data[0].url)
                 elif hasattr(response, 'images') and response.images and len(response.images) > 0:
                     # 尝试另一种响应格式
                     image_url = response.images[0].url if hasattr(response.images[0], 'url') else response.images[0]
-                    images.append(GeneratedImage(
-                        segment_id=segment.id,
-                        image_url=image_url,
-                        thumbnail_url=image_url,
-                        status="completed"
-                    ))
-                else:
-                    # API调用失败，使用备选方案
-                    print(f"API响应格式异常: {response}")
-                    images.append(GeneratedImage(
-                        segment_id=segment.id,
-                        image_url=f"https://picsum.photos/600/800?random={segment.id + 100}",
-                        thumbnail_url=f"https://picsum.photos/150/200?random={segment.id + 100}",
-                        status="failed"
-                    ))
+                    return await register_proxied_image(image_url)
+                logger.warning("API响应格式异常: %s", response)
+                return None
+            
+            # 相同(模型, 尺寸, 提示词)复用已生成的图片，重复段落并发时只调用一次
+            cache_key = _image_cache_key("seedream", VOLCANO_IMAGE_MODEL, VOLCANO_IMAGE_SIZE, combined_prompt)
+            image_url = await _get_or_generate_image(cache_key, generate_seedream_image)
+            if image_url:
+                return GeneratedImage(
+                    segment_id=segment.id,
+                    image_url=image_url,
+                    thumbnail_url=image_url,  # 可以后续添加缩略图生成逻辑
+                    status="completed"
+                )
             else:
-                # 客户端未初始化，使用演示图片
-                # 使用不同的颜色和更好的文本来模拟真实图片
-                colors = ["4f46e5", "7c3aed", "db2777", "dc2626", "ea580c", "d97706", "65a30d", "059669", "0891b2", "0284c7"]
-                color = colors[(segment.id - 1) % len(colors)]
-                
-                # 使用AI生成的image_prompt来创建真正相关的图片
-                image_prompt = segment.image_prompt if segment.image_prompt else f"{style_prompt}，{segment.content[:100]}..."
-                
-                try:
+                # API调用失败，使用备选方案
+                return GeneratedImage(
+                    segment_id=segment.id,
+                    image_url=f"https://picsum.photos/600/800?random={segment.id + 100}",
+                    thumbnail_url=f"https://picsum.photos/150/200?random={segment.id + 100}",
+                    status="failed"
+                )
+        else:
+            # 客户端未初始化，使用演示图片
+            # 使用AI生成的image_prompt来创建真正相关的图片
+            image_prompt = _segment_image_prompt(segment, style_prompt)
+            
+            try:
+                async with _SEGMENT_SEMAPHORE:
                     # 使用AI图片生成服务生成图片
-                    original_image_url = await image_generator.generate_image(image_prompt, segment.id)
+                    original_image_url = await image_service.generate_image(image_prompt, segment.id)
                     
                     # 使用图文合成服务创建最终的图文合成图片
-                    composed_image_url = await image_composer.compose_image_text(
+                    composed_image_url = await composer.compose_image_text(
                         original_image_url, 
                         segment.content, 
                         segment.summary
                     )
-                    
-                    images.append(GeneratedImage(
-                        segment_id=segment.id,
-                        image_url=composed_image_url,
-                        thumbnail_url=composed_image_url,  # 缩略图使用同一张图片
-                        status="completed"
-                    ))
-                    
-                except Exception as generation_error:
-                    print(f"图片生成或合成失败 (段落 {segment.id}): {generation_error}")
-                    # 使用备选方案：生成基于内容的占位图片
-                    fallback_url = await image_generator._generate_demo_image(image_prompt, segment.id)
-                    
-                    images.append(GeneratedImage(
-                        segment_id=segment.id,
-                        image_url=fallback_url,
-                        thumbnail_url=fallback_url,
-                        status="completed"
-                    ))
                 
-        except Exception as api_error:
-            print(f"SeeDream API调用失败: {api_error}")
-            # 使用备选方案
-            images.append(GeneratedImage(
-                segment_id=segment.id,
-                image_url=f"https://picsum.photos/600/800?random={segment.id + 200}",
-                thumbnail_url=f"https://picsum.photos/150/200?random={segment.id + 200}",
-                status="failed"
-            ))
-    
-    return images
+                return GeneratedImage(
+                    segment_id=segment.id,
+                    image_url=composed_image_url,
+                    thumbnail_url=composed_image_url,  # 缩略图使用同一张图片
+                    status="completed"
+                )
+                
+            except Exception:
+                logger.exception("图片生成或合成失败 (段落 %s)", segment.id)
+                # 使用备选方案：进程内生成带段落内容的占位图片，不再重复调用图片服务
+                fallback_url = _placeholder_data_uri(segment)
+                
+                return GeneratedImage(
+                    segment_id=segment.id,
+                    image_url=fallback_url,
+                    thumbnail_url=fallback_url,
+                    status="failed"
+                )
+            
+    except Exception:
+        logger.exception("SeeDream API调用失败 (段落 %s)", segment.id)
+        # 使用备选方案
+        return GeneratedImage(
+            segment_id=segment.id,
+            image_url=f"https://picsum.photos/600/800?random={segment.id + 200}",
+            thumbnail_url=f"https://picsum.photos/150/200?random={segment.id + 200}",
+            status="failed"
+        )
+
+async def generate_images_with_seedream(segments: List[TextSegment], style_prompt: str,
+                                        image_service: Optional[ImageGenerationService] = None,
+                                        composer: Optional[ImageComposer] = None,
+                                        batch_id: Optional[str] = None) -> List[GeneratedImage]:
+    """
+    使用SeeDream 4.0生成图片（各段落并发生成）
+    batch_id: 不为空时每完成一段即更新该批次的进度
+    """
+    image_service = image_service or image_generator
+    composer = composer or image_composer
+    
+    async def track(segment_task) -> GeneratedImage:
+        image = await segment_task
+        if batch_id:
+            await _update_batch_state(batch_id, completed=1)
+        return image
+    
+    segment_tasks = _segment_image_tasks(segments, style_prompt, image_service, composer)
+    return list(await asyncio.gather(*(track(segment_task) for segment_task in segment_tasks)))
+
+def _segment_image_tasks(segments: List[TextSegment], style_prompt: str,
+                         image_service: ImageGenerationService,
+                         composer: ImageComposer) -> list:
+    """
+    构建各段落的图片生成协程（按段落顺序），每个协程独立生成并合成自己的图片，由调用方决定并发收集方式
+    """
+    if client:
+        return [_generate_segment_image(segment, style_prompt) for segment in segments]
+    
+    # 演示模式：各段落各自生成原图后立即合成，流式端点可逐段返回；相同提示词由图片缓存合并为一次生成
+    return [_generate_segment_image(segment, style_prompt, image_service, composer) for segment in segments]
 
 # API端点
+# 静态响应体在导入时序列化一次
+_ROOT_RESPONSE_BYTES = orjson.dumps({"message": "创意加速器 API 服务正在运行", "version": "1.0.0"})
+_HEALTH_RESPONSE_BYTES = orjson.dumps({"status": "healthy", "service": "long-text-to-images"})
+
 @app.get("/")
 async def root():
-    return {"message": "创意加速器 API 服务正在运行", "version": "1.0.0"}
+    return Response(content=_ROOT_RESPONSE_BYTES, media_type="application/json")
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "long-text-to-images"}
+    return Response(content=_HEALTH_RESPONSE_BYTES, media_type="application/json")
+
+@app.get("/openapi.json", include_in_schema=False)
+async def openapi_json(request: Request):
+    # 通常由启动时的lifespan预先序列化；未经lifespan运行时（如嵌入其他应用）首次请求时生成并缓存
+    openapi_bytes = getattr(request.app.state, "openapi_bytes", None)
+    if openapi_bytes is None:
+        openapi_bytes = request.app.state.openapi_bytes = orjson.dumps(request.app.openapi())
+    return Response(content=openapi_bytes, media_type="application/json")
+
+@app.get("/docs", include_in_schema=False)
+async def swagger_ui():
+    return get_swagger_ui_html(openapi_url="/openapi.json", title=f"{app.title} - Swagger UI")
+
+@app.get("/redoc", include_in_schema=False)
+async def redoc():
+    return get_redoc_html(openapi_url="/openapi.json", title=f"{app.title} - ReDoc")
 
 @app.post("/api/analyze-text", response_model=TextAnalysisResponse)
 async def analyze_text(request: TextAnalysisRequest):
     """
     分析长文本，智能拆分为多个段落
     """
+    # 验证输入（放在try之外，保留400状态码）
+    if len(request.text.strip()) == 0:
+        raise HTTPException(status_code=400, detail="文本内容不能为空")
+    
+    if len(request.text) > 10000:  # 限制1万字
+        raise HTTPException(status_code=400, detail="文本长度不能超过10000字")
+    
     try:
-        # 验证输入
-        if len(request.text.strip()) == 0:
-            raise HTTPException(status_code=400, detail="文本内容不能为空")
-        
-        if len(request.text) > 10000:  # 限制1万字
-            raise HTTPException(status_code=400, detail="文本长度不能超过10000字")
-        
         # 调用AI分析服务
         segments = await analyze_text_with_doubao(request.text, request.style_prompt or "现代简约风格")
         
@@ -2261,21 +2927,32 @@ async def analyze_text(request: TextAnalysisRequest):
         raise HTTPException(status_code=500, detail=f"文本分析失败: {str(e)}")
 
 @app.post("/api/generate-images", response_model=ImageGenerationResponse)
-async def generate_images(request: ImageGenerationRequest):
+async def generate_images(request: ImageGenerationRequest,
+                          image_service: ImageGenerationService = Depends(get_image_service),
+                          composer: ImageComposer = Depends(get_image_composer)):
     """
     根据文本段落生成对应图片
     """
+    # 验证输入（放在try之外，保留400状态码）
+    if not request.segments:
+        raise HTTPException(status_code=400, detail="文本段落不能为空")
+    
     try:
-        # 验证输入
-        if not request.segments:
-            raise HTTPException(status_code=400, detail="文本段落不能为空")
-        
         # 生成批次ID
-        import uuid
-        batch_id = str(uuid.uuid4())
+        batch_id = uuid4().hex
+        
+        # 登记批次状态，生成过程中可通过 /api/batch-status/{batch_id} 查询进度
+        await _create_batch_state(batch_id, len(request.segments))
         
         # 调用图片生成服务
-        images = await generate_images_with_seedream(request.segments, request.style_prompt)
+        try:
+            images = await generate_images_with_seedream(
+                request.segments, request.style_prompt, image_service, composer, batch_id
+            )
+        except Exception:
+            await _update_batch_state(batch_id, status="failed")
+            raise
+        await _update_batch_state(batch_id, status="completed")
         
         return ImageGenerationResponse(
             images=images,
@@ -2286,20 +2963,213 @@ async def generate_images(request: ImageGenerationRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"图片生成失败: {str(e)}")
 
+# 流式响应禁止反向代理（nginx）缓冲，保证每行NDJSON及时送达客户端
+_STREAM_HEADERS = {"X-Accel-Buffering": "no", "Cache-Control": "no-cache"}
+
+@app.post("/api/generate-images/stream")
+async def generate_images_stream(request: ImageGenerationRequest,
+                                 image_service: ImageGenerationService = Depends(get_image_service),
+                                 composer: ImageComposer = Depends(get_image_composer)):
+    """
+    流式生成图片：每完成一个段落即输出一行JSON（NDJSON，按完成先后），批次ID在 X-Batch-Id 响应头中
+    """
+    if not request.segments:
+        raise HTTPException(status_code=400, detail="文本段落不能为空")
+    
+    batch_id = uuid4().hex
+    await _create_batch_state(batch_id, len(request.segments))
+    
+    async def stream_images():
+        tasks = []
+        try:
+            segment_tasks = _segment_image_tasks(request.segments, request.style_prompt, image_service, composer)
+            tasks = [asyncio.ensure_future(segment_task) for segment_task in segment_tasks]
+            for next_image in asyncio.as_completed(tasks):
+                image = await next_image
+                await _update_batch_state(batch_id, completed=1)
+                yield orjson.dumps(image.model_dump()) + b"\n"
+            await _update_batch_state(batch_id, status="completed")
+        except Exception:
+            logger.exception("流式图片生成失败")
+            await _update_batch_state(batch_id, status="failed")
+        finally:
+            # 客户端提前断开时取消尚未完成的段落
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(stream_images(), media_type="application/x-ndjson",
+                             headers={"X-Batch-Id": batch_id, **_STREAM_HEADERS})
+
+@app.post("/api/analyze-and-generate")
+async def analyze_and_generate(request: TextAnalysisRequest,
+                               image_service: ImageGenerationService = Depends(get_image_service),
+                               composer: ImageComposer = Depends(get_image_composer)):
+    """
+    分析与生图流水线：每分析出一个段落就立即开始生成其图片，结果以NDJSON逐行返回
+    每行为 {"type": "segment", "segment": {...}} 或 {"type": "image", "image": {...}}，批次ID在 X-Batch-Id 响应头中
+    """
+    if len(request.text.strip()) == 0:
+        raise HTTPException(status_code=400, detail="文本内容不能为空")
+    
+    if len(request.text) > 10000:  # 限制1万字
+        raise HTTPException(status_code=400, detail="文本长度不能超过10000字")
+    
+    batch_id = uuid4().hex
+    await _create_batch_state(batch_id, 0)
+    style_prompt = request.style_prompt or "现代简约风格"
+    
+    async def generate_segment(segment: TextSegment, events: asyncio.Queue):
+        image = await _generate_segment_image(segment, style_prompt, image_service, composer)
+        await _update_batch_state(batch_id, completed=1)
+        await events.put({"type": "image", "image": image.model_dump()})
+    
+    async def produce(events: asyncio.Queue, image_tasks: list):
+        try:
+            async with aclosing(iter_text_segments(request.text, style_prompt)) as segments:
+                async for segment in segments:
+                    await _update_batch_state(batch_id, added=1)
+                    await events.put({"type": "segment", "segment": segment.model_dump()})
+                    image_tasks.append(asyncio.ensure_future(generate_segment(segment, events)))
+                    # 限制段落数量
+                    if request.max_segments and len(image_tasks) >= request.max_segments:
+                        break
+            await asyncio.gather(*image_tasks)
+            await _update_batch_state(batch_id, status="completed")
+        except Exception:
+            logger.exception("分析与生图流水线失败")
+            await _update_batch_state(batch_id, status="failed")
+        finally:
+            await events.put(None)
+    
+    async def stream_events():
+        events: asyncio.Queue = asyncio.Queue()
+        image_tasks = []
+        producer = asyncio.ensure_future(produce(events, image_tasks))
+        try:
+            while (event := await events.get()) is not None:
+                yield orjson.dumps(event) + b"\n"
+        finally:
+            # 客户端提前断开时停止分析并取消尚未完成的段落
+            producer.cancel()
+            for task in image_tasks:
+                task.cancel()
+    
+    return StreamingResponse(stream_events(), media_type="application/x-ndjson",
+                             headers={"X-Batch-Id": batch_id, **_STREAM_HEADERS})
+
+# 正在下载中的代理图片（哈希 -> 下载任务）
+_pending_proxy_downloads: Dict[str, asyncio.Task] = {}
+
+async def _download_proxied_image(image_hash: str, cached_path: str):
+    """从服务商下载代理图片并原子落盘，同时记录其媒体类型"""
+    source_url = await _lookup_proxied_image(image_hash)
+    if not source_url:
+        raise HTTPException(status_code=404, detail="图片不存在或已过期")
+    
+    response = await get_http_client().get(source_url)
+    if response.status_code != 200:
+        raise HTTPException(status_code=502, detail=f"无法下载图片: {response.status_code}")
+    
+    await asyncio.to_thread(_write_file_atomic, IMAGE_PROXY_CACHE_DIR, cached_path, response.content)
+    # 记录服务商返回的媒体类型，后续命中无需再解析文件
+    content_type = response.headers.get("content-type", "").split(";")[0].strip()
+    if content_type.startswith("image/"):
+        _lru_remember(_proxied_image_types, image_hash, content_type, IMAGE_PROXY_MAP_SIZE)
+
+@app.get("/api/img/{image_hash}")
+async def proxy_image(image_hash: str, request: Request):
+    """
+    代理生成的图片：首次访问时从服务商下载并落盘，之后直接返回本地文件，允许浏览器/CDN长期缓存
+    """
+    if not _IMAGE_HASH_PATTERN.match(image_hash):
+        raise HTTPException(status_code=404, detail="图片不存在")
+    
+    etag = f'"{image_hash}"'
+    cache_headers = {
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "ETag": etag
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=cache_headers)
+    
+    cached_path = os.path.join(IMAGE_PROXY_CACHE_DIR, image_hash)
+    if not os.path.exists(cached_path):
+        # 同一图片的并发首次访问共享同一个下载任务
+        download_task = _pending_proxy_downloads.get(image_hash)
+        if download_task is None:
+            download_task = asyncio.ensure_future(_download_proxied_image(image_hash, cached_path))
+            _pending_proxy_downloads[image_hash] = download_task
+            download_task.add_done_callback(lambda _: _pending_proxy_downloads.pop(image_hash, None))
+        # shield：某个请求断开时不影响其他等待同一图片的请求
+        await asyncio.shield(download_task)
+    
+    media_type = _proxied_image_types.get(image_hash)
+    if media_type is None:
+        # 其他worker下载或重启前落盘的文件：在线程中识别一次类型后缓存
+        media_type = await asyncio.to_thread(_sniff_image_media_type, cached_path)
+        _lru_remember(_proxied_image_types, image_hash, media_type, IMAGE_PROXY_MAP_SIZE)
+    return FileResponse(cached_path, media_type=media_type, headers=cache_headers)
+
+_COMPOSED_NAME_PATTERN = re.compile(r'^[0-9a-f]{40}\.webp$')
+
+@app.get("/api/composed/{composed_name}")
+async def composed_image(composed_name: str, request: Request):
+    """
+    返回合成图片：文件名即内容哈希，内容不会变化，允许浏览器/CDN长期缓存
+    """
+    if not _COMPOSED_NAME_PATTERN.match(composed_name):
+        raise HTTPException(status_code=404, detail="图片不存在")
+    
+    etag = f'"{composed_name[:-5]}"'
+    cache_headers = {
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "ETag": etag
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=cache_headers)
+    
+    composed_path = os.path.join(COMPOSED_IMAGE_DIR, composed_name)
+    if not os.path.exists(composed_path):
+        raise HTTPException(status_code=404, detail="图片不存在")
+    return FileResponse(composed_path, media_type="image/webp", headers=cache_headers)
+
 @app.get("/api/batch-status/{batch_id}")
 async def get_batch_status(batch_id: str):
     """
     查询批次生成状态
     """
-    # TODO: 实现批次状态查询逻辑
+    state = await _load_batch_state(batch_id)
+    if state is None:
+        # 批次已过期，或未启用Redis时由其他worker创建：返回unknown而非报错，前端可继续轮询
+        return {
+            "batch_id": batch_id,
+            "status": "unknown",
+            "progress": 0,
+            "completed_count": 0,
+            "total_count": 0
+        }
+    
+    total_count = state["total_count"]
+    completed_count = state["completed_count"]
     return {
         "batch_id": batch_id,
-        "status": "completed",
-        "progress": 100,
-        "completed_count": 5,
-        "total_count": 5
+        "status": state["status"],
+        "progress": completed_count * 100 // total_count if total_count else 100,
+        "completed_count": completed_count,
+        "total_count": total_count
     }
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    # 开发时设置 DEV=1 开启热重载（单进程）；默认按 WEB_CONCURRENCY 启动多个worker
+    # loop/http 为auto时，已安装uvloop与httptools即自动使用（Windows上回退到asyncio）
+    dev_mode = os.getenv("DEV") == "1"
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=dev_mode,
+        workers=1 if dev_mode else int(os.getenv("WEB_CONCURRENCY", "4")),
+        loop="auto",
+        http="auto"
+    )
\ No newline at end of file